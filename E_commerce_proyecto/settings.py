@@ -44,6 +44,11 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Mide la petición completa, incluidos los demás middlewares
+    'store.middleware.RequestMetricsMiddleware',
+    # Debe ir antes que el resto: marca la petición como apta para leer de la réplica
+    # y detecta cualquier escritura de los middlewares que vienen detrás.
+    'store.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -65,6 +70,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'store.context_processors.categories',
             ],
         },
     },
@@ -76,13 +82,100 @@ WSGI_APPLICATION = 'E_commerce_proyecto.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# PRAGMAs que se aplican a cada conexión SQLite nueva:
+# - WAL: los lectores no se bloquean mientras alguien escribe (carrito, sesión, checkout).
+# - synchronous=NORMAL: en WAL sigue siendo seguro ante caídas de la aplicación y
+#   evita un fsync por transacción.
+# - busy_timeout: espera hasta 5 s por el bloqueo en lugar de fallar con "database is locked".
+# - mmap_size / cache_size / temp_store: lecturas desde memoria y tablas temporales
+#   (ORDER BY, GROUP BY) sin tocar disco.
+SQLITE_PRAGMAS = [
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA busy_timeout=5000',
+    'PRAGMA mmap_size=268435456',
+    'PRAGMA cache_size=-65536',
+    'PRAGMA temp_store=MEMORY',
+]
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            'init_command': ';'.join(SQLITE_PRAGMAS),
+            # Las transacciones toman el bloqueo de escritura al empezar (BEGIN IMMEDIATE):
+            # un "leer stock y luego escribir" ya no falla al intentar ascender el bloqueo.
+            'transaction_mode': 'IMMEDIATE',
+        },
     }
 }
 
+# Réplica de solo lectura para el catálogo y los informes (ver store.db_router).
+# Para probarla en local con un segundo archivo SQLite:
+#   DJANGO_SQLITE_REPLICA=1 python manage.py sync_replica --loop
+# La réplica no usa WAL: solo se lee y sync_replica la reemplaza de forma atómica.
+if os.environ.get('DJANGO_SQLITE_REPLICA'):
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.replica.sqlite3',
+        'OPTIONS': {
+            'init_command': ';'.join(['PRAGMA query_only=ON'] + [
+                pragma for pragma in SQLITE_PRAGMAS
+                if not pragma.startswith(('PRAGMA journal_mode', 'PRAGMA synchronous'))
+            ]),
+        },
+        'TEST': {'MIRROR': 'default'},
+    }
+
+# Alias que reciben las lecturas enrutables; sin réplicas todo va a 'default'.
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['store.db_router.PrimaryReplicaRouter']
+
+# Segundos que un cliente sigue leyendo del primario tras escribir, para que
+# vea sus propios cambios aunque la réplica vaya con retraso.
+REPLICA_PIN_SECONDS = 10
+
+
+# Instrumentación por petición (cabecera Server-Timing y registro en el
+# logger 'store.requests' de las peticiones lentas o con demasiadas consultas).
+# Activa en desarrollo; en producción con DJANGO_REQUEST_METRICS=1.
+REQUEST_METRICS_ENABLED = DEBUG or os.environ.get('DJANGO_REQUEST_METRICS') == '1'
+REQUEST_METRICS_SLOW_MS = 500
+REQUEST_METRICS_MAX_QUERIES = 30
+# Veces que se repite una misma consulta (cambiando solo los valores) para
+# señalarla como posible N+1
+REQUEST_METRICS_DUPLICATE_THRESHOLD = 5
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+# Las invalidaciones (invalidate_categories, bump_page_scopes) publican una
+# nueva versión en la caché, así que todos los procesos del servidor deben
+# compartirla. Con varios workers (gunicorn, uwsgi) o servidores hay que
+# definir DJANGO_REDIS_URL. La caché en memoria (LocMemCache) es local a cada
+# proceso: solo es correcta con un único proceso, como runserver.
+# No se usa FileBasedCache: cada escritura lista el directorio completo para
+# decidir si purgar, y hay una clave de versión por producto.
+if os.environ.get('DJANGO_REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['DJANGO_REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'omnistorer',
+        }
+    }
+
+# Segundos que una página del catálogo queda en la caché de visitantes anónimos
+PAGE_CACHE_TIMEOUT = 60 * 10
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -157,6 +250,14 @@ EMAIL_HOST_PASSWORD = 'naeo cqnl lvug qfvj' # <--- CAMBIA ESTO (usa una contrase
 # Definición de una tarifa de envío fija para el MVP.
 SHIPPING_FEE = 5.00
 
+# Número de productos por página del catálogo (paginación por cursor)
+PRODUCTS_PER_PAGE = 24
+
+# Segundos que se aparta el stock de un checkout mientras el cliente paga.
+# La sesión de Stripe expira a la vez (como mínimo a los 30 min que exige
+# Stripe) y la reserva dura un minuto más que ella.
+STOCK_RESERVATION_TTL = 60 * 30
+
 # --------------------------------------------------------------------------
 # CONFIGURACIÓN DE PAGO - SPRINT 2 (Stripe)
 # --------------------------------------------------------------------------
@@ -1,3 +1,44 @@
 from django.contrib import admin
 
-# Register your models here.
+from store.pagination import EstimatedCountPaginator
+from .models import Order, OrderItem
+
+
+class OrderItemInline(admin.TabularInline):
+    model = OrderItem
+    extra = 0
+    can_delete = False
+    fields = ('product', 'quantity', 'price')
+    readonly_fields = fields
+
+    def get_queryset(self, request):
+        # El nombre de cada producto sale del JOIN, no de una consulta por línea
+        return super().get_queryset(request).select_related('product')
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(Order)
+class OrderAdmin(admin.ModelAdmin):
+    list_display = ('id', 'customer', 'customer_email', 'total_paid', 'oversold', 'created')
+    list_filter = ('oversold',)
+    list_select_related = ('customer',)
+    search_fields = ('=id', '=customer_email', '=stripe_checkout_session_id')
+    raw_id_fields = ('customer',)
+    readonly_fields = ('stripe_checkout_session_id', 'total_paid', 'short_product_ids', 'created', 'updated')
+    inlines = [OrderItemInline]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 50
+
+
+@admin.register(OrderItem)
+class OrderItemAdmin(admin.ModelAdmin):
+    list_display = ('id', 'order', 'product', 'quantity', 'price')
+    list_select_related = ('order', 'product')
+    search_fields = ('=order__id', '=product__sku')
+    raw_id_fields = ('order', 'product')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 50
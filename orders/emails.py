@@ -0,0 +1,139 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.utils import timezone
+
+from .models import OutgoingEmail
+
+
+# --------------------
+# Bandeja de salida de correos
+# --------------------
+
+def enqueue_email(subject, body, to, from_email=None):
+    """
+    Deja un correo en la bandeja de salida. No abre ninguna conexión SMTP:
+    el envío real lo hace el comando send_outbox_emails.
+    """
+    return OutgoingEmail.objects.create(
+        subject=subject,
+        body=body,
+        to=to,
+        from_email=from_email or settings.EMAIL_HOST_USER,
+    )
+
+
+def retry_delay(attempts, base_seconds=60):
+    """
+    Espera exponencial entre reintentos: 1, 2, 4, 8... minutos, hasta 1 día.
+    """
+    return timedelta(seconds=min(base_seconds * 2 ** (attempts - 1), 60 * 60 * 24))
+
+
+def requeue_stale_emails(stale_after):
+    """
+    Devuelve a PENDING los correos que siguen en SENDING desde hace más de
+    stale_after: el proceso que los reclamó murió antes de registrar el
+    resultado. Pueden enviarse dos veces, pero nunca se pierden.
+    """
+    return OutgoingEmail.objects.filter(
+        status=OutgoingEmail.SENDING, claimed_at__lt=timezone.now() - stale_after,
+    ).update(status=OutgoingEmail.PENDING)
+
+
+def send_pending_emails(batch_size=100, max_attempts=5, connection=None, stale_after=timedelta(minutes=15)):
+    """
+    Envía un lote de correos pendientes usando una sola conexión del backend
+    configurado (SMTP, locmem, file...). Cada correo se envía por separado
+    sobre esa conexión para poder reintentar solo los que fallen.
+
+    Antes de enviar, cada correo se reclama con un UPDATE condicional
+    (PENDING → SENDING), así dos procesos simultáneos (o un cron que se
+    solapa con un envío lento) nunca mandan el mismo correo dos veces.
+
+    Devuelve un Counter con el número de correos por estado final.
+    """
+    requeue_stale_emails(stale_after)
+
+    now = timezone.now()
+    candidates = list(
+        OutgoingEmail.objects.filter(status=OutgoingEmail.PENDING, next_attempt_at__lte=now)
+        .order_by('next_attempt_at')[:batch_size]
+    )
+    batch = [
+        email for email in candidates
+        if OutgoingEmail.objects.filter(pk=email.pk, status=OutgoingEmail.PENDING).update(
+            status=OutgoingEmail.SENDING, claimed_at=timezone.now(),
+        )
+    ]
+    stats = Counter()
+    if not batch:
+        return stats
+
+    connection = connection or get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as e:
+        # Sin conexión no se puede enviar nada: se reprograma todo el lote
+        for email in batch:
+            _register_failure(email, e, max_attempts, now)
+            stats[email.status] += 1
+        return stats
+
+    try:
+        for email in batch:
+            message = EmailMessage(email.subject, email.body, email.from_email, [email.to], connection=connection)
+            try:
+                connection.send_messages([message])
+            except Exception as e:
+                _register_failure(email, e, max_attempts, now)
+            else:
+                email.status = OutgoingEmail.SENT
+                email.sent_at = timezone.now()
+                email.last_error = ''
+                email.save(update_fields=['status', 'sent_at', 'last_error'])
+            stats[email.status] += 1
+    finally:
+        connection.close()
+
+    return stats
+
+
+def _register_failure(email, error, max_attempts, now):
+    email.attempts += 1
+    email.last_error = str(error)
+    if email.attempts >= max_attempts:
+        email.status = OutgoingEmail.FAILED
+    else:
+        email.status = OutgoingEmail.PENDING
+        email.next_attempt_at = now + retry_delay(email.attempts)
+    email.save(update_fields=['attempts', 'last_error', 'status', 'next_attempt_at'])
+
+
+# --------------------
+# Correos de órdenes
+# --------------------
+
+def send_order_confirmation_email(order):
+    """
+    Encola el correo de confirmación de compra para el cliente.
+    """
+    subject = f'Confirmación de tu compra #{order.id}'
+    # Usar el nombre de usuario del cliente si está disponible, si no, usar el correo
+    customer_identifier = order.customer.username if order.customer else order.customer_email
+
+    message = (
+        f'Hola {customer_identifier},\n\n'
+        f'¡Gracias por tu compra! Tu orden #{order.id} ha sido confirmada y tu pago ha sido procesado exitosamente.\n'
+        f'Tu pedido será enviado a la siguiente dirección:\n'
+        f'{order.shipping_address}\n\n'
+        f'Total Pagado: ${order.total_paid:.2f}\n\n'
+        f'Puedes ver los detalles completos de tu orden en tu historial de compras.\n\n'
+        f'¡Gracias por preferirnos!\n'
+        f'El equipo de tu tienda'
+    )
+
+    # El envío real lo hace send_outbox_emails, fuera del ciclo de la petición
+    enqueue_email(subject, message, order.customer_email)
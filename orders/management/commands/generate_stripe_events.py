@@ -0,0 +1,135 @@
+import hashlib
+import hmac
+import json
+import random
+import time
+import urllib.request
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from django.urls import resolve, reverse
+
+from store.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        'Genera eventos checkout.session.completed falsos, firmados con '
+        'STRIPE_WEBHOOK_SECRET, y los envía al webhook para probar la carga '
+        'del pipeline de órdenes sin conexión a Stripe.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=100,
+                            help='Número de eventos a generar (por defecto: 100).')
+        parser.add_argument('--user', required=True,
+                            help='Nombre de usuario del cliente de las órdenes generadas.')
+        parser.add_argument('--max-items', type=int, default=3,
+                            help='Máximo de productos distintos por orden (por defecto: 3).')
+        parser.add_argument('--seed', type=int, default=None,
+                            help='Semilla para reproducir la misma secuencia de eventos.')
+        parser.add_argument('--url', default=None,
+                            help='URL de un servidor en marcha (ej: http://127.0.0.1:8000/webhook/stripe/). '
+                                 'Si se omite, la vista del webhook se invoca en el mismo proceso.')
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"No existe el usuario '{options['user']}'.")
+
+        products = list(Product.objects.filter(available=True).values_list('id', 'price')[:1000])
+        if not products:
+            raise CommandError('No hay productos disponibles para generar órdenes.')
+
+        rng = random.Random(options['seed'])
+        send = self._sender(options['url'])
+
+        statuses = {}
+        start = time.perf_counter()
+        for _ in range(options['count']):
+            body = json.dumps(self._fake_event(rng, user, products, options['max_items']))
+            status = send(body, self._signature(body))
+            statuses[status] = statuses.get(status, 0) + 1
+        elapsed = time.perf_counter() - start
+
+        summary = ', '.join(f'HTTP {status}: {count}' for status, count in sorted(statuses.items()))
+        self.stdout.write(self.style.SUCCESS(
+            f"{options['count']} eventos enviados en {elapsed:.2f}s "
+            f"({options['count'] / elapsed:.0f} eventos/s). {summary}."
+        ))
+
+    def _fake_event(self, rng, user, products, max_items):
+        """
+        Construye un evento con la misma forma que los de Stripe. Los line items
+        van incrustados en la sesión para que el worker no llame a la API.
+        """
+        chosen = rng.sample(products, k=rng.randint(1, min(max_items, len(products))))
+        line_items = []
+        amount_total = 0
+        for product_id, price in chosen:
+            quantity = rng.randint(1, 2)
+            amount = int(price * 100) * quantity
+            amount_total += amount
+            line_items.append({
+                'object': 'item',
+                'quantity': quantity,
+                'amount_total': amount,
+                'price': {'product': {'metadata': {'product_id': str(product_id)}}},
+            })
+
+        return {
+            'id': f'evt_fake_{uuid.uuid4().hex}',
+            'object': 'event',
+            'type': 'checkout.session.completed',
+            'data': {
+                'object': {
+                    'id': f'cs_fake_{uuid.uuid4().hex}',
+                    'object': 'checkout.session',
+                    'payment_status': 'paid',
+                    'amount_total': amount_total,
+                    'customer_details': {'email': user.email},
+                    'metadata': {
+                        'customer_id': str(user.id),
+                        'shipping_address': 'Dirección de prueba 123',
+                    },
+                    'line_items': {'object': 'list', 'data': line_items},
+                },
+            },
+        }
+
+    def _signature(self, body):
+        # Mismo esquema que Stripe: v1 = HMAC-SHA256(secret, "<timestamp>.<body>")
+        timestamp = int(time.time())
+        signed = hmac.new(
+            settings.STRIPE_WEBHOOK_SECRET.encode(),
+            f'{timestamp}.{body}'.encode(),
+            hashlib.sha256,
+        ).hexdigest()
+        return f't={timestamp},v1={signed}'
+
+    def _sender(self, url):
+        if url:
+            def send(body, signature):
+                request = urllib.request.Request(
+                    url, data=body.encode(), method='POST',
+                    headers={'Content-Type': 'application/json', 'Stripe-Signature': signature},
+                )
+                with urllib.request.urlopen(request) as response:
+                    return response.status
+            return send
+
+        # En el mismo proceso llamamos directamente a la vista del webhook
+        factory = RequestFactory()
+        path = reverse('stripe_webhook')
+        view = resolve(path).func
+
+        def send(body, signature):
+            request = factory.post(path, data=body, content_type='application/json',
+                                   HTTP_STRIPE_SIGNATURE=signature)
+            return view(request).status_code
+        return send
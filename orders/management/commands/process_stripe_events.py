@@ -0,0 +1,52 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from orders.services import process_pending_events
+
+
+class Command(BaseCommand):
+    help = (
+        'Procesa por lotes los eventos de Stripe guardados por el webhook '
+        '(checkout.session.completed → crea la orden).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100,
+                            help='Eventos procesados por lote (por defecto: 100).')
+        parser.add_argument('--max-attempts', type=int, default=5,
+                            help='Intentos antes de marcar un evento como fallido (por defecto: 5).')
+        parser.add_argument('--stale-minutes', type=float, default=15,
+                            help='Minutos tras los que un evento en proceso se considera abandonado '
+                                 'y vuelve a la cola (por defecto: 15).')
+        parser.add_argument('--loop', action='store_true',
+                            help='Sigue esperando eventos nuevos en lugar de terminar cuando no quedan.')
+        parser.add_argument('--sleep', type=float, default=1.0,
+                            help='Segundos de espera entre consultas cuando no hay eventos (con --loop).')
+
+    def handle(self, *args, **options):
+        total = 0
+        start = time.perf_counter()
+
+        while True:
+            stats = process_pending_events(
+                batch_size=options['batch_size'],
+                max_attempts=options['max_attempts'],
+                stale_after=timedelta(minutes=options['stale_minutes']),
+            )
+            processed = sum(stats.values())
+            total += processed
+            if processed:
+                summary = ', '.join(f'{status}: {count}' for status, count in sorted(stats.items()))
+                self.stdout.write(f'Lote procesado ({summary}).')
+            elif options['loop']:
+                time.sleep(options['sleep'])
+            else:
+                break
+
+        elapsed = time.perf_counter() - start
+        rate = total / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'{total} eventos procesados en {elapsed:.2f}s ({rate:.0f} eventos/s).'
+        ))
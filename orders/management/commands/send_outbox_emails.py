@@ -0,0 +1,49 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from orders.emails import send_pending_emails
+
+
+class Command(BaseCommand):
+    help = (
+        'Envía por lotes los correos pendientes de la bandeja de salida usando '
+        'una única conexión del EMAIL_BACKEND configurado, con reintentos.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100,
+                            help='Correos enviados por lote (por defecto: 100).')
+        parser.add_argument('--max-attempts', type=int, default=5,
+                            help='Intentos antes de marcar un correo como fallido (por defecto: 5).')
+        parser.add_argument('--stale-minutes', type=float, default=15,
+                            help='Minutos tras los que un correo en envío se considera abandonado '
+                                 'y vuelve a la cola (por defecto: 15).')
+        parser.add_argument('--loop', action='store_true',
+                            help='Sigue esperando correos nuevos en lugar de terminar cuando no quedan.')
+        parser.add_argument('--sleep', type=float, default=5.0,
+                            help='Segundos de espera entre consultas cuando no hay correos (con --loop).')
+
+    def handle(self, *args, **options):
+        total = 0
+        start = time.perf_counter()
+
+        while True:
+            stats = send_pending_emails(
+                batch_size=options['batch_size'],
+                max_attempts=options['max_attempts'],
+                stale_after=timedelta(minutes=options['stale_minutes']),
+            )
+            processed = sum(stats.values())
+            total += processed
+            if processed:
+                summary = ', '.join(f'{status}: {count}' for status, count in sorted(stats.items()))
+                self.stdout.write(f'Lote enviado ({summary}).')
+            elif options['loop']:
+                time.sleep(options['sleep'])
+            else:
+                break
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(f'{total} correos procesados en {elapsed:.2f}s.'))
@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from orders.reports import update_sales_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        'Actualiza las tablas de resumen de ventas (diarias, por producto y por categoría) '
+        'con las órdenes creadas desde la última ejecución.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Órdenes procesadas por lote y transacción (por defecto: 5000).')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        total = update_sales_rollups(batch_size=options['batch_size'])
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(f'{total} órdenes nuevas incorporadas en {elapsed:.2f}s.'))
@@ -0,0 +1,30 @@
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def recompute_daily_revenue(apps, schema_editor):
+    # Los ingresos diarios sumaban Order.total_paid (con envío); pasan a ser la
+    # suma de las líneas, que ya está en el rollup por producto
+    DailySales = apps.get_model('orders', 'DailySales')
+    DailyProductSales = apps.get_model('orders', 'DailyProductSales')
+    line_revenue = (
+        DailyProductSales.objects.filter(date=OuterRef('date'))
+        .values('date')
+        .annotate(total=Sum('revenue'))
+        .values('total')
+    )
+    DailySales.objects.update(revenue=Coalesce(Subquery(line_revenue), Value(Decimal('0'))))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0008_outgoing_email_claim'),
+    ]
+
+    operations = [
+        migrations.RunPython(recompute_daily_revenue, migrations.RunPython.noop),
+    ]
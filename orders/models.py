@@ -1,6 +1,7 @@
 from django.db import models
 from django.conf import settings
-from store.models import Product
+from django.utils import timezone
+from store.models import Category, Product
 
 class Order(models.Model):
     customer = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True)
@@ -8,6 +9,9 @@ class Order(models.Model):
     shipping_address = models.TextField()
     stripe_checkout_session_id = models.CharField(max_length=250, null=True, blank=True, unique=True)
     total_paid = models.DecimalField(max_digits=10, decimal_places=2)
+    # Pagada en Stripe sin stock suficiente: el staff debe completarla o reembolsarla
+    oversold = models.BooleanField(default=False)
+    short_product_ids = models.JSONField(default=list, blank=True)
     created = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
 
@@ -15,6 +19,10 @@ class Order(models.Model):
         ordering = ('-created',)
         verbose_name = 'pedido'
         verbose_name_plural = 'pedidos'
+        indexes = [
+            # Historial de compras: customer + ORDER BY created DESC, sin ordenar en memoria
+            models.Index(fields=['customer', '-created'], name='order_customer_created_idx'),
+        ]
 
     def __str__(self):
         return f'Pedido {self.id}'
@@ -26,4 +34,165 @@ class OrderItem(models.Model):
     quantity = models.IntegerField()
 
     def __str__(self):
-        return str(self.id)
\ No newline at end of file
+        return str(self.id)
+
+class StripeEvent(models.Model):
+    """
+    Bandeja de entrada de eventos de Stripe. El webhook solo verifica la firma
+    y guarda el evento aquí; el comando process_stripe_events los procesa por
+    lotes. event_id es único, así que un reenvío de Stripe no se procesa dos veces.
+    """
+    PENDING = 'pending'
+    PROCESSING = 'processing'
+    PROCESSED = 'processed'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pendiente'),
+        (PROCESSING, 'Procesando'),
+        (PROCESSED, 'Procesado'),
+        (FAILED, 'Fallido'),
+    ]
+
+    event_id = models.CharField(max_length=255, unique=True)
+    type = models.CharField(max_length=100)
+    payload = models.JSONField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    # Momento en que un worker lo reclamó: si sigue en PROCESSING mucho después,
+    # el worker murió y el evento vuelve a la cola
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ('created',)
+        verbose_name = 'evento de Stripe'
+        verbose_name_plural = 'eventos de Stripe'
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+
+    def __str__(self):
+        return f'{self.type} ({self.event_id})'
+
+
+class OutgoingEmail(models.Model):
+    """
+    Bandeja de salida de correos. Las vistas y workers solo insertan filas;
+    el comando send_outbox_emails las envía por lotes reutilizando una única
+    conexión SMTP y reintenta los fallos con espera exponencial.
+    """
+    PENDING = 'pending'
+    SENDING = 'sending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pendiente'),
+        (SENDING, 'Enviando'),
+        (SENT, 'Enviado'),
+        (FAILED, 'Fallido'),
+    ]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=255, blank=True)
+    to = models.EmailField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    # Momento en que un proceso lo reclamó para enviarlo (estado SENDING)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ('created',)
+        verbose_name = 'correo saliente'
+        verbose_name_plural = 'correos salientes'
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+
+    def __str__(self):
+        return f'{self.subject} → {self.to}'
+
+
+# --------------------
+# Tablas de resumen de ventas (rollups)
+# --------------------
+
+class DailySales(models.Model):
+    """
+    Totales de ventas por día. La rellena de forma incremental el comando
+    update_sales_rollups; los informes leen de aquí y no de Order.
+    """
+    date = models.DateField(unique=True)
+    orders = models.PositiveIntegerField(default=0)
+    # Suma de las líneas sin envío, como en los rollups por producto y categoría
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    units = models.PositiveIntegerField(default=0)
+    # Órdenes que son la primera compra de su cliente / de clientes que ya habían comprado
+    new_customers = models.PositiveIntegerField(default=0)
+    returning_orders = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ('date',)
+        verbose_name = 'ventas diarias'
+        verbose_name_plural = 'ventas diarias'
+
+    def __str__(self):
+        return f'{self.date}: {self.orders} órdenes'
+
+
+class DailyProductSales(models.Model):
+    date = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='daily_sales')
+    orders = models.PositiveIntegerField(default=0)
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ('date',)
+        verbose_name = 'ventas diarias por producto'
+        verbose_name_plural = 'ventas diarias por producto'
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'product'], name='unique_daily_product_sales'),
+        ]
+
+    def __str__(self):
+        return f'{self.date} - {self.product_id}: {self.units}'
+
+
+class DailyCategorySales(models.Model):
+    date = models.DateField()
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='daily_sales')
+    orders = models.PositiveIntegerField(default=0)
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ('date',)
+        verbose_name = 'ventas diarias por categoría'
+        verbose_name_plural = 'ventas diarias por categoría'
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'category'], name='unique_daily_category_sales'),
+        ]
+
+    def __str__(self):
+        return f'{self.date} - {self.category_id}: {self.units}'
+
+
+class RollupWatermark(models.Model):
+    """
+    Última orden incorporada a cada rollup: la siguiente ejecución continúa
+    desde aquí en lugar de recorrer todo el historial.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    last_order_id = models.BigIntegerField(default=0)
+    updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.name}: {self.last_order_id}'
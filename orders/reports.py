@@ -0,0 +1,169 @@
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Min, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import DailyCategorySales, DailyProductSales, DailySales, Order, OrderItem, RollupWatermark
+
+
+# --------------------
+# Rollups de ventas
+# --------------------
+
+SALES_WATERMARK = 'sales'
+
+DAILY_COUNTERS = ['orders', 'revenue', 'units', 'new_customers', 'returning_orders']
+ITEM_COUNTERS = ['orders', 'units', 'revenue']
+
+LINE_REVENUE = Sum(F('price') * F('quantity'), output_field=DecimalField(max_digits=14, decimal_places=2))
+
+
+def update_sales_rollups(batch_size=5000):
+    """
+    Incorpora a las tablas de resumen las órdenes creadas desde la última
+    ejecución (según RollupWatermark), por lotes de batch_size órdenes.
+
+    Cada lote se procesa en una transacción que también avanza la marca de
+    agua, así que interrumpir el comando nunca cuenta una orden dos veces.
+    Los ingresos son siempre la suma de las líneas (precio × cantidad, sin
+    envío): el total diario coincide con el de productos y categorías.
+    Devuelve el número de órdenes procesadas.
+    """
+    total = 0
+    while True:
+        processed = _process_batch(batch_size)
+        if not processed:
+            return total
+        total += processed
+
+
+def _process_batch(batch_size):
+    with transaction.atomic():
+        watermark, _ = RollupWatermark.objects.select_for_update().get_or_create(name=SALES_WATERMARK)
+        orders = list(
+            Order.objects.filter(id__gt=watermark.last_order_id)
+            .order_by('id')
+            .values_list('id', 'customer_id', TruncDate('created'))[:batch_size]
+        )
+        if not orders:
+            return 0
+        first_id, last_id = watermark.last_order_id, orders[-1][0]
+
+        # Primera orden de cada cliente del lote (una consulta agregada por índice)
+        customers = {customer_id for _, customer_id, _ in orders if customer_id}
+        first_orders = dict(
+            Order.objects.filter(customer_id__in=customers)
+            .values('customer_id')
+            .annotate(first=Min('id'))
+            .values_list('customer_id', 'first')
+        )
+
+        daily = defaultdict(lambda: {'orders': 0, 'revenue': Decimal('0'), 'units': 0,
+                                     'new_customers': 0, 'returning_orders': 0})
+        for order_id, customer_id, day in orders:
+            row = daily[day]
+            row['orders'] += 1
+            if customer_id:
+                if first_orders.get(customer_id) == order_id:
+                    row['new_customers'] += 1
+                else:
+                    row['returning_orders'] += 1
+
+        items = OrderItem.objects.filter(order_id__gt=first_id, order_id__lte=last_id)
+        by_product = (
+            items.values('product_id', day=TruncDate('order__created'))
+            .annotate(orders=Count('order_id', distinct=True), units=Sum('quantity'), revenue=LINE_REVENUE)
+            .order_by()
+        )
+        by_category = (
+            items.values(category_id=F('product__category_id'), day=TruncDate('order__created'))
+            .annotate(orders=Count('order_id', distinct=True), units=Sum('quantity'), revenue=LINE_REVENUE)
+            .order_by()
+        )
+
+        product_rows = {}
+        for row in by_product:
+            product_rows[(row['day'], row['product_id'])] = row
+            daily[row['day']]['units'] += row['units']
+            daily[row['day']]['revenue'] += row['revenue']
+        category_rows = {(row['day'], row['category_id']): row for row in by_category}
+
+        _merge(DailySales, {(day, None): values for day, values in daily.items()}, DAILY_COUNTERS)
+        _merge(DailyProductSales, product_rows, ITEM_COUNTERS, 'product_id')
+        _merge(DailyCategorySales, category_rows, ITEM_COUNTERS, 'category_id')
+
+        watermark.last_order_id = last_id
+        watermark.save(update_fields=['last_order_id', 'updated'])
+    return len(orders)
+
+
+def _merge(model, rows, counters, key_field=None):
+    """
+    Suma `rows` ({(día, clave): valores}) a las filas existentes del rollup y
+    las escribe con un único INSERT ... ON CONFLICT DO UPDATE.
+    """
+    if not rows:
+        return
+    existing = model.objects.filter(date__in={day for day, _ in rows})
+    if key_field:
+        existing = existing.filter(**{f'{key_field}__in': {key for _, key in rows}})
+    current = {(obj.date, getattr(obj, key_field) if key_field else None): obj for obj in existing}
+
+    objs = []
+    for (day, key), values in rows.items():
+        obj = current.get((day, key)) or model(date=day, **({key_field: key} if key_field else {}))
+        for field in counters:
+            setattr(obj, field, getattr(obj, field) + values[field])
+        objs.append(obj)
+
+    unique_fields = ['date', key_field.removesuffix('_id')] if key_field else ['date']
+    model.objects.bulk_create(objs, update_conflicts=True, unique_fields=unique_fields, update_fields=counters)
+
+
+# --------------------
+# Informe de ventas
+# --------------------
+
+def sales_report(since=None, until=None, top=10):
+    """
+    Resumen de ventas entre dos fechas (incluidas) leído solo de los rollups:
+    su coste depende del número de días pedido, no del historial completo.
+    Por defecto, los últimos 30 días.
+    """
+    until = until or timezone.localdate()
+    since = since or until - timedelta(days=29)
+    date_range = {'date__range': (since, until)}
+
+    days = list(DailySales.objects.filter(**date_range))
+    totals = {
+        field: sum((getattr(day, field) for day in days), Decimal('0') if field == 'revenue' else 0)
+        for field in DAILY_COUNTERS
+    }
+    customer_orders = totals['new_customers'] + totals['returning_orders']
+    totals['repeat_rate'] = totals['returning_orders'] / customer_orders * 100 if customer_orders else 0
+
+    top_products = (
+        DailyProductSales.objects.filter(**date_range)
+        .values('product_id', 'product__name')
+        .annotate(units=Sum('units'), revenue=Sum('revenue'), orders=Sum('orders'))
+        .order_by('-revenue')[:top]
+    )
+    top_categories = (
+        DailyCategorySales.objects.filter(**date_range)
+        .values('category_id', 'category__name')
+        .annotate(units=Sum('units'), revenue=Sum('revenue'), orders=Sum('orders'))
+        .order_by('-revenue')[:top]
+    )
+
+    return {
+        'since': since,
+        'until': until,
+        'days': days,
+        'totals': totals,
+        'top_products': list(top_products),
+        'top_categories': list(top_categories),
+    }
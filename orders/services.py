@@ -0,0 +1,281 @@
+import json
+import logging
+from collections import Counter
+from datetime import timedelta
+from decimal import Decimal
+
+import stripe
+from django.conf import settings
+from django.db import router, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from store.cache import bump_page_scopes, product_scope
+from store.instrumentation import timed
+from store.inventory import release_reservation
+from store.models import Product
+from .emails import retry_delay, send_order_confirmation_email
+from .models import Order, OrderItem, StripeEvent
+
+logger = logging.getLogger('orders')
+
+# --------------------
+# Finalización de órdenes
+# --------------------
+
+CENTS = Decimal('0.01')
+
+
+def cents_to_decimal(amount):
+    """
+    Convierte un importe de Stripe (centavos, entero) a Decimal sin pasar por float.
+    """
+    return (Decimal(amount) / 100).quantize(CENTS)
+
+
+def items_from_stripe(line_items):
+    """
+    Extrae (product_id, cantidad, precio_unitario) de los line items de una
+    sesión de Stripe (en formato JSON, expandidos con 'data.price.product').
+    Las líneas sin product_id en la metadata (p. ej. el costo de envío) se omiten.
+    """
+    items = []
+    for item in line_items:
+        product = (item.get('price') or {}).get('product')
+        metadata = product.get('metadata') if isinstance(product, dict) else None
+        product_id_str = (metadata or {}).get('product_id')
+        if not product_id_str:
+            continue
+        unit_price = (cents_to_decimal(item['amount_total']) / item['quantity']).quantize(CENTS)
+        items.append((int(product_id_str), item['quantity'], unit_price))
+    return items
+
+
+def finalize_order(session_id, customer_id, customer_email, shipping_address, total_paid, items, reservation=None):
+    """
+    Crea la orden de una sesión de Stripe pagada como una única transacción.
+
+    - Es idempotente: si ya existe una orden para session_id, la devuelve.
+    - Descuenta el stock con UPDATE ... SET stock = stock - n WHERE stock >= n,
+      así dos órdenes simultáneas nunca pierden decrementos ni dejan stock negativo.
+    - Convierte en venta la reserva de stock del checkout (si la hay): se
+      borra en la misma transacción en que se descuenta el stock.
+    - Crea todos los OrderItem con un solo bulk_create.
+
+    El pago ya está cobrado: si algún producto no tiene stock suficiente, la
+    orden se guarda igualmente marcada como oversold (con los productos en
+    short_product_ids) para que el staff la revise o reembolse, y se registra
+    un aviso en el logger 'orders'. Devuelve una tupla (order, created).
+    """
+    with transaction.atomic():
+        order, created = Order.objects.get_or_create(
+            stripe_checkout_session_id=session_id,
+            defaults={
+                'customer_id': customer_id,
+                'customer_email': customer_email,
+                'shipping_address': shipping_address,
+                'total_paid': total_paid,
+            },
+        )
+        if not created:
+            return order, False
+
+        # Una sola consulta para comprobar qué productos siguen existiendo
+        existing = dict(
+            Product.objects.filter(id__in={product_id for product_id, _, _ in items})
+            .values_list('id', 'slug')
+        )
+        items = [item for item in items if item[0] in existing]
+
+        quantities = Counter()
+        for product_id, quantity, _ in items:
+            quantities[product_id] += quantity
+
+        short = [
+            product_id
+            for product_id, quantity in quantities.items()
+            if not Product.objects.filter(id=product_id, stock__gte=quantity).update(stock=F('stock') - quantity)
+        ]
+        if short:
+            order.oversold = True
+            order.short_product_ids = short
+            order.save(update_fields=['oversold', 'short_product_ids', 'updated'])
+            logger.warning(
+                'Orden %s (sesión %s) pagada sin stock suficiente de los productos %s: requiere revisión o reembolso.',
+                order.pk, session_id, ', '.join(map(str, short)),
+            )
+
+        if reservation:
+            release_reservation(reservation)
+
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product_id=product_id, quantity=quantity, price=price)
+            for product_id, quantity, price in items
+        ])
+
+        # El stock aparece en la página de detalle: se invalida su caché al confirmar
+        scopes = [product_scope(existing[product_id]) for product_id in quantities]
+        transaction.on_commit(lambda: bump_page_scopes(*scopes))
+
+    return order, True
+
+
+def delete_order_history(customers):
+    """
+    Elimina todas las órdenes (y sus líneas) de los clientes indicados
+    (queryset o lista de ids) con borrados por conjuntos. Devuelve el número
+    de órdenes eliminadas.
+    """
+    with transaction.atomic(using=router.db_for_write(Order)):
+        # Sin dependientes ni señales, las líneas se borran con un único DELETE;
+        # después, el Collector de las órdenes solo necesita cargar sus ids
+        OrderItem.objects.filter(order__customer__in=customers).delete()
+        _, deleted = Order.objects.filter(customer__in=customers).only('pk').delete()
+    return deleted.get(Order._meta.label, 0)
+
+
+def fetch_line_items(session):
+    """
+    Devuelve los line items de una sesión de Checkout como lista de dicts.
+
+    Si el payload ya los trae incrustados (como los eventos generados con
+    generate_stripe_events) no se llama a la API de Stripe.
+    """
+    embedded = session.get('line_items')
+    if embedded:
+        return embedded['data']
+    with timed('stripe'):
+        line_items = stripe.checkout.Session.list_line_items(
+            session['id'],
+            expand=['data.price.product'],  # Expandir para acceder a la metadata del producto
+            limit=100,
+            api_key=settings.STRIPE_SECRET_KEY,
+        )
+    # str() de un objeto de Stripe es su JSON, en todas las versiones de la librería
+    return json.loads(str(line_items))['data']
+
+
+def finalize_checkout_session(session):
+    """
+    Crea la orden de una sesión 'checkout.session.completed' pagada y encola
+    el correo de confirmación la primera vez. La orden y el correo de la
+    bandeja de salida se guardan en la misma transacción: o quedan los dos o
+    ninguno, así un reintento nunca encuentra la orden sin su correo.
+    """
+    if session.get('payment_status') != 'paid':
+        return None, False
+
+    metadata = session.get('metadata') or {}
+    customer_details = session.get('customer_details') or {}
+    # Fuera de la transacción: la llamada a Stripe no debe retener el bloqueo de escritura
+    items = items_from_stripe(fetch_line_items(session))
+    with transaction.atomic():
+        order, created = finalize_order(
+            session_id=session['id'],
+            customer_id=metadata.get('customer_id'),
+            customer_email=customer_details.get('email') or session.get('customer_email') or '',
+            shipping_address=metadata.get('shipping_address', ''),
+            # Stripe amount_total está en centavos
+            total_paid=cents_to_decimal(session['amount_total']),
+            items=items,
+            reservation=metadata.get('reservation'),
+        )
+        if created:
+            send_order_confirmation_email(order)
+    return order, created
+
+
+def release_checkout_session(session):
+    """
+    Libera la reserva de stock de una sesión de Checkout que expiró sin pago,
+    sin esperar a que la reserva venza.
+    """
+    reservation = (session.get('metadata') or {}).get('reservation')
+    if reservation:
+        release_reservation(reservation)
+
+
+# --------------------
+# Bandeja de entrada de eventos de Stripe
+# --------------------
+
+EVENT_HANDLERS = {
+    'checkout.session.completed': finalize_checkout_session,
+    'checkout.session.expired': release_checkout_session,
+}
+
+
+def record_event(event):
+    """
+    Guarda un evento verificado en la bandeja de entrada con un único INSERT.
+    Los reenvíos del mismo evento (mismo event_id) se ignoran.
+    """
+    StripeEvent.objects.bulk_create(
+        [StripeEvent(event_id=event['id'], type=event['type'], payload=event)],
+        ignore_conflicts=True,
+    )
+
+
+def requeue_stale_events(stale_after, max_attempts):
+    """
+    Devuelve a la cola los eventos que siguen en PROCESSING desde hace más de
+    stale_after (el worker que los reclamó murió a mitad). Los que ya agotaron
+    sus intentos pasan a FAILED. Devuelve cuántos eventos se recuperaron.
+    """
+    stale = StripeEvent.objects.filter(
+        status=StripeEvent.PROCESSING, claimed_at__lt=timezone.now() - stale_after,
+    )
+    stale.filter(attempts__gte=max_attempts).update(
+        status=StripeEvent.FAILED, last_error='El worker no terminó de procesar el evento.',
+    )
+    return stale.update(status=StripeEvent.PENDING, next_attempt_at=timezone.now())
+
+
+def process_pending_events(batch_size=100, max_attempts=5, stale_after=timedelta(minutes=15)):
+    """
+    Procesa un lote de eventos pendientes cuyo próximo intento ya venció, del
+    más antiguo al más reciente.
+
+    Cada evento se reclama con un UPDATE condicional antes de procesarlo, de
+    modo que varios workers pueden ejecutarse a la vez sin duplicar órdenes.
+    Los errores se reintentan con espera exponencial (retry_delay) hasta
+    max_attempts veces, y los eventos abandonados por un worker caído se
+    recuperan tras stale_after. Devuelve un Counter con el número de eventos
+    por estado final.
+    """
+    requeue_stale_events(stale_after, max_attempts)
+
+    stats = Counter()
+    now = timezone.now()
+    batch = list(
+        StripeEvent.objects.filter(status=StripeEvent.PENDING, next_attempt_at__lte=now)
+        .order_by('next_attempt_at')[:batch_size]
+    )
+
+    for event in batch:
+        claimed = StripeEvent.objects.filter(pk=event.pk, status=StripeEvent.PENDING).update(
+            status=StripeEvent.PROCESSING, attempts=F('attempts') + 1, claimed_at=timezone.now(),
+        )
+        if not claimed:
+            continue
+        event.attempts += 1
+
+        handler = EVENT_HANDLERS.get(event.type)
+        try:
+            if handler is not None:
+                handler(event.payload['data']['object'])
+            event.status = StripeEvent.PROCESSED
+            event.processed_at = timezone.now()
+            event.last_error = ''
+        except Exception as e:
+            event.last_error = str(e)
+            if event.attempts >= max_attempts:
+                event.status = StripeEvent.FAILED
+            else:
+                event.status = StripeEvent.PENDING
+                event.next_attempt_at = timezone.now() + retry_delay(event.attempts)
+
+        event.save(update_fields=['status', 'processed_at', 'last_error', 'next_attempt_at'])
+        stats[event.status] += 1
+
+    return stats
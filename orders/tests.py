@@ -1,3 +1,264 @@
-from django.test import TestCase
+import hashlib
+import hmac
+import json
+import time
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.mail import get_connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from store.testing import StoreDataMixin
+from .emails import enqueue_email, send_pending_emails
+from .models import DailySales, Order, OutgoingEmail, StripeEvent
+from .reports import sales_report, update_sales_rollups
+from .services import finalize_checkout_session, finalize_order, process_pending_events
+
+WEBHOOK_SECRET = 'whsec_test'
+
+
+def checkout_event(event_id, session_id, product, quantity=1):
+    """
+    Evento checkout.session.completed con los line items incrustados, como
+    los de generate_stripe_events (el worker no llama a la API de Stripe).
+    """
+    amount = int(product.price * 100) * quantity
+    return {
+        'id': event_id,
+        'type': 'checkout.session.completed',
+        'data': {'object': {
+            'id': session_id,
+            'payment_status': 'paid',
+            'amount_total': amount,
+            'customer_details': {'email': 'cliente@example.com'},
+            'metadata': {'shipping_address': 'Calle 1'},
+            'line_items': {'data': [{
+                'quantity': quantity,
+                'amount_total': amount,
+                'price': {'product': {'metadata': {'product_id': str(product.id)}}},
+            }]},
+        }},
+    }
+
+
+# --------------------
+# Finalización de órdenes
+# --------------------
+
+class FinalizeOrderTests(StoreDataMixin, TestCase):
+    def finalize(self, session_id='cs_1', quantity=2):
+        return finalize_order(
+            session_id, None, 'cliente@example.com', 'Calle 1', Decimal('20.00'),
+            [(self.product.id, quantity, Decimal('10.00'))],
+        )
+
+    def test_creates_order_and_decrements_stock(self):
+        order, created = self.finalize()
+        self.assertTrue(created)
+        self.assertFalse(order.oversold)
+        self.assertEqual(order.items.get().quantity, 2)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 3)
+
+    def test_is_idempotent_per_session(self):
+        first, _ = self.finalize()
+        second, created = self.finalize()
+        self.assertFalse(created)
+        self.assertEqual(first, second)
+        self.assertEqual(Order.objects.count(), 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 3)
+
+    def test_out_of_stock_keeps_paid_order_flagged_as_oversold(self):
+        with self.assertLogs('orders', 'WARNING'):
+            order, created = self.finalize(quantity=8)
+        self.assertTrue(created)
+        self.assertTrue(order.oversold)
+        self.assertEqual(order.short_product_ids, [self.product.id])
+        self.assertEqual(order.items.get().quantity, 8)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 5)
+
+
+# --------------------
+# Webhook y bandeja de eventos
+# --------------------
+
+def sign(body, secret=WEBHOOK_SECRET):
+    timestamp = int(time.time())
+    signature = hmac.new(secret.encode(), f'{timestamp}.{body}'.encode(), hashlib.sha256).hexdigest()
+    return f't={timestamp},v1={signature}'
+
+
+@override_settings(STRIPE_WEBHOOK_SECRET=WEBHOOK_SECRET)
+class StripeWebhookTests(StoreDataMixin, TestCase):
+    def post(self, body, signature):
+        return self.client.post(
+            reverse('stripe_webhook'), data=body, content_type='application/json', HTTP_STRIPE_SIGNATURE=signature,
+        )
+
+    def test_rejects_invalid_signature(self):
+        body = json.dumps(checkout_event('evt_1', 'cs_1', self.product))
+        self.assertEqual(self.post(body, sign(body, secret='otro')).status_code, 400)
+        self.assertEqual(self.post(body, 't=1,v1=nada').status_code, 400)
+        self.assertFalse(StripeEvent.objects.exists())
+
+    def test_records_valid_event_once(self):
+        body = json.dumps(checkout_event('evt_1', 'cs_1', self.product))
+        self.assertEqual(self.post(body, sign(body)).status_code, 200)
+        self.assertEqual(self.post(body, sign(body)).status_code, 200)
+        self.assertEqual(StripeEvent.objects.count(), 1)
+
+        process_pending_events()
+        process_pending_events()
+        self.assertEqual(StripeEvent.objects.get().status, StripeEvent.PROCESSED)
+        self.assertEqual(Order.objects.count(), 1)
+
+
+class ProcessPendingEventsTests(StoreDataMixin, TestCase):
+    def test_failures_back_off_instead_of_retrying_at_once(self):
+        StripeEvent.objects.create(event_id='evt_1', type='checkout.session.completed',
+                                   payload={'data': {'object': {'id': 'cs_1', 'payment_status': 'paid'}}})
+        self.assertEqual(process_pending_events(), {StripeEvent.PENDING: 1})
+        # El reintento todavía no ha vencido
+        self.assertEqual(process_pending_events(), {})
+
+        event = StripeEvent.objects.get()
+        self.assertEqual(event.attempts, 1)
+        self.assertGreater(event.next_attempt_at, timezone.now())
+
+    def test_stale_processing_events_are_requeued(self):
+        event = checkout_event('evt_1', 'cs_1', self.product)
+        StripeEvent.objects.create(event_id='evt_1', type=event['type'], payload=event,
+                                   status=StripeEvent.PROCESSING, attempts=1,
+                                   claimed_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(process_pending_events(), {StripeEvent.PROCESSED: 1})
+        self.assertEqual(Order.objects.count(), 1)
+
+
+# --------------------
+# Bandeja de salida de correos
+# --------------------
+
+class ConfirmationEmailTests(StoreDataMixin, TestCase):
+    def test_confirmation_email_is_enqueued_once_with_the_order(self):
+        event = checkout_event('evt_1', 'cs_1', self.product)
+        finalize_checkout_session(event['data']['object'])
+        finalize_checkout_session(event['data']['object'])
+        self.assertEqual(OutgoingEmail.objects.count(), 1)
+
+    def test_failed_enqueue_rolls_back_the_order(self):
+        event = checkout_event('evt_1', 'cs_1', self.product)
+        with mock.patch('orders.services.send_order_confirmation_email', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                finalize_checkout_session(event['data']['object'])
+        self.assertFalse(Order.objects.exists())
+        # El reintento crea la orden y su correo
+        finalize_checkout_session(event['data']['object'])
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(OutgoingEmail.objects.count(), 1)
+
+
+class FailingBackend:
+    def __init__(self, fail):
+        self.fail = fail
+
+    def open(self):
+        pass
+
+    def close(self):
+        pass
+
+    def send_messages(self, messages):
+        if self.fail:
+            raise OSError('SMTP caído')
+        return len(messages)
+
+
+class OutboxTests(TestCase):
+    def test_failed_email_is_retried_later(self):
+        email = enqueue_email('Asunto', 'Cuerpo', 'cliente@example.com')
+
+        self.assertEqual(send_pending_emails(connection=FailingBackend(fail=True)), {OutgoingEmail.PENDING: 1})
+        email.refresh_from_db()
+        self.assertEqual(email.attempts, 1)
+        self.assertGreater(email.next_attempt_at, timezone.now())
+        # Hasta que venza la espera no se vuelve a intentar
+        self.assertEqual(send_pending_emails(connection=FailingBackend(fail=False)), {})
+
+        OutgoingEmail.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(send_pending_emails(connection=FailingBackend(fail=False)), {OutgoingEmail.SENT: 1})
+
+    def test_gives_up_after_max_attempts(self):
+        enqueue_email('Asunto', 'Cuerpo', 'cliente@example.com')
+        for _ in range(2):
+            OutgoingEmail.objects.update(next_attempt_at=timezone.now())
+            send_pending_emails(max_attempts=2, connection=FailingBackend(fail=True))
+        self.assertEqual(OutgoingEmail.objects.get().status, OutgoingEmail.FAILED)
+
+    def test_claimed_emails_are_not_sent_twice(self):
+        enqueue_email('Asunto', 'Cuerpo', 'a@example.com')
+        enqueue_email('Asunto', 'Cuerpo', 'b@example.com')
+        # Otro proceso ya reclamó el primero
+        OutgoingEmail.objects.filter(to='a@example.com').update(
+            status=OutgoingEmail.SENDING, claimed_at=timezone.now(),
+        )
+        connection = get_connection('django.core.mail.backends.locmem.EmailBackend')
+        self.assertEqual(send_pending_emails(connection=connection), {OutgoingEmail.SENT: 1})
+        self.assertEqual([message.to for message in mail.outbox], [['b@example.com']])
+
+
+# --------------------
+# Rollups de ventas
+# --------------------
+
+class SalesRollupTests(StoreDataMixin, TestCase):
+    def create_order(self, customer, quantity, shipping=Decimal('0')):
+        order = Order.objects.create(customer=customer, customer_email=customer.email, shipping_address='Calle 1',
+                                     total_paid=Decimal('10.00') * quantity + shipping)
+        order.items.create(product=self.product, quantity=quantity, price=Decimal('10.00'))
+        return order
+
+    def test_incremental_updates_match_full_totals(self):
+        ana = User.objects.create(username='ana', email='ana@example.com')
+        luis = User.objects.create(username='luis', email='luis@example.com')
+        self.create_order(ana, 1)
+        self.create_order(luis, 2)
+        self.assertEqual(update_sales_rollups(batch_size=1), 2)
+
+        # Solo se incorporan las órdenes nuevas, sin contar dos veces las anteriores
+        self.create_order(ana, 3)
+        self.assertEqual(update_sales_rollups(), 1)
+        self.assertEqual(update_sales_rollups(), 0)
+
+        day = DailySales.objects.get()
+        self.assertEqual((day.orders, day.units, day.revenue), (3, 6, Decimal('60.00')))
+        self.assertEqual((day.new_customers, day.returning_orders), (2, 1))
+
+        report = sales_report()
+        self.assertEqual(report['totals']['revenue'], Decimal('60.00'))
+        self.assertEqual(report['top_products'][0]['units'], 6)
+        self.assertEqual(report['top_categories'][0]['category__name'], 'Ropa')
+
+    def test_daily_revenue_uses_line_totals_like_products_and_categories(self):
+        self.create_order(User.objects.create(username='ana', email='ana@example.com'), 2, shipping=Decimal('5.00'))
+        update_sales_rollups()
+
+        report = sales_report()
+        self.assertEqual(report['totals']['revenue'], Decimal('20.00'))
+        self.assertEqual(report['top_products'][0]['revenue'], Decimal('20.00'))
+        self.assertEqual(report['top_categories'][0]['revenue'], Decimal('20.00'))
+
+    def test_dashboard_reads_the_rollups(self):
+        self.create_order(User.objects.create(username='ana', email='ana@example.com'), 2)
+        update_sales_rollups()
+        self.client.force_login(User.objects.create_user('staff', is_staff=True))
+
+        response = self.client.get(reverse('sales_dashboard'))
+        self.assertContains(response, 'Camisa')
+        self.assertEqual(response.context['totals']['orders'], 1)
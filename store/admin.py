@@ -1,24 +1,24 @@
 from django.contrib import admin
-from .models import Product
+from .models import Category, ContactMessage, Product
+from .pagination import EstimatedCountPaginator
 from django.contrib.auth.models import User
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 
-# Importa el modelo Order desde la app 'orders'
-from orders.models import Order
+# Servicio de la app 'orders' que borra el historial de compras
+from orders.services import delete_order_history
 
 
 @admin.action(description='Eliminar historial de compras')
 def delete_purchase_history(modeladmin, request, queryset):
     """
     Acción de administración para eliminar todas las órdenes de los usuarios seleccionados.
+    Se borran por conjuntos, sin recorrer los usuarios.
     """
-    for user in queryset:
-        # Corrige el nombre del campo para que coincida con el modelo Order
-        Order.objects.filter(customer=user).delete()
+    deleted = delete_order_history(queryset)
 
     modeladmin.message_user(
         request,
-        f"Se eliminó el historial de compras de {queryset.count()} usuario(s) exitosamente."
+        f"Se eliminaron {deleted} órdenes del historial de compras de los usuarios seleccionados."
     )
 
 
@@ -27,10 +27,53 @@ class CustomUserAdmin(BaseUserAdmin):
     Personaliza la administración del modelo User.
     """
     actions = [delete_purchase_history]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
 
 # Re-registra el modelo de usuario con tu clase de administración personalizada
 admin.site.unregister(User)
 admin.site.register(User, CustomUserAdmin)
 
-# Registra los modelos de tu tienda en el panel de administración
-admin.site.register(Product)
\ No newline at end of file
+
+# --------------------
+# Catálogo
+# --------------------
+
+@admin.register(Category)
+class CategoryAdmin(admin.ModelAdmin):
+    list_display = ('name', 'slug')
+    search_fields = ('name', '=slug')
+    prepopulated_fields = {'slug': ('name',)}
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+@admin.register(Product)
+class ProductAdmin(admin.ModelAdmin):
+    """
+    Changelist pensado para millones de productos: la categoría se trae con
+    un JOIN (sin N+1), el total no se cuenta con COUNT(*) y el buscador usa
+    igualdad exacta para el SKU.
+    """
+    list_display = ('name', 'sku', 'category', 'price', 'stock', 'available', 'updated')
+    list_select_related = ('category',)
+    list_filter = ('available',)
+    search_fields = ('=sku', 'name')
+    prepopulated_fields = {'slug': ('name',)}
+    # Un <select> con miles de categorías pesaría más que la propia página
+    raw_id_fields = ('category',)
+    readonly_fields = ('created', 'updated')
+    ordering = ('-id',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 50
+
+
+@admin.register(ContactMessage)
+class ContactMessageAdmin(admin.ModelAdmin):
+    list_display = ('name', 'email', 'created_at')
+    search_fields = ('=email', 'name')
+    readonly_fields = ('name', 'email', 'message', 'created_at')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class StoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'store'
+
+    def ready(self):
+        # Registra los receptores de señales (índice de búsqueda, etc.) y las comprobaciones
+        from . import checks, signals  # noqa: F401
@@ -0,0 +1,224 @@
+import hashlib
+import time
+import zlib
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.contrib.messages.storage.session import SessionStorage
+from django.core.cache import cache
+from django.http import Http404, HttpResponse
+from django.middleware.csrf import get_token
+from django.template.loader import render_to_string
+from django.utils.functional import SimpleLazyObject
+
+from .cart import CART_SESSION_KEY
+from .models import Category
+
+
+# --------------------
+# Caché de la navegación por categorías
+# --------------------
+
+CATEGORY_VERSION_KEY = 'store:categories:version'
+CATEGORY_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def _category_version():
+    # Si la clave de versión desaparece (reinicio, expulsión), se genera una nueva
+    # y las entradas antiguas quedan huérfanas en lugar de servirse obsoletas.
+    return cache.get_or_set(CATEGORY_VERSION_KEY, time.time_ns, timeout=None)
+
+
+def get_category_navigation():
+    """
+    Devuelve (lista de categorías, mapa slug → categoría, mapa id → categoría)
+    desde la caché, consultando la base de datos solo cuando la versión ha
+    cambiado.
+    """
+    key = f'store:categories:nav:{_category_version()}'
+    navigation = cache.get(key)
+    if navigation is None:
+        categories = list(Category.objects.all())
+        navigation = (
+            categories,
+            {category.slug: category for category in categories},
+            {category.pk: category for category in categories},
+        )
+        cache.set(key, navigation, CATEGORY_CACHE_TIMEOUT)
+    return navigation
+
+
+def invalidate_categories():
+    """
+    Invalida la navegación cacheada publicando una nueva versión.
+    """
+    cache.set(CATEGORY_VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def get_category_or_404(slug):
+    """
+    Equivalente a get_object_or_404(Category, slug=slug) usando el mapa cacheado.
+    """
+    category = get_category_navigation()[1].get(slug)
+    if category is None:
+        raise Http404('No existe la categoría solicitada.')
+    return category
+
+
+def get_category_slug(category_id):
+    """
+    Slug de una categoría por su id usando el mapa cacheado, sin cargar la
+    relación del producto. None si la categoría ya no existe.
+    """
+    category = get_category_navigation()[2].get(category_id)
+    return category.slug if category is not None else None
+
+
+def lazy_categories():
+    """
+    Lista de categorías evaluada solo si la plantilla llega a usarla.
+    """
+    return SimpleLazyObject(lambda: get_category_navigation()[0])
+
+
+# --------------------
+# Caché de páginas completas para visitantes anónimos
+# --------------------
+
+PAGE_VERSION_KEY = 'store:pages:version:{scope}'
+CSRF_PLACEHOLDER = '__CSRF_TOKEN_PLACEHOLDER__'
+
+
+def home_scope():
+    return 'home'
+
+
+def category_scope(slug):
+    return f'category:{slug}'
+
+
+def product_scope(slug):
+    return f'product:{slug}'
+
+
+def is_page_cacheable(request):
+    """
+    Solo se cachean los GET de visitantes anónimos sin carrito ni mensajes
+    pendientes: para ellos la página es idéntica salvo el token CSRF.
+
+    Si no hay cookie de sesión, ni siquiera se carga la sesión.
+    """
+    if request.method != 'GET' or CookieStorage.cookie_name in request.COOKIES:
+        return False
+    if settings.SESSION_COOKIE_NAME not in request.COOKIES:
+        return True
+    return (
+        not request.user.is_authenticated
+        and not request.session.get(CART_SESSION_KEY)
+        and not request.session.get(SessionStorage.session_key)
+    )
+
+
+def _page_cache_key(request, scope):
+    # La versión de categorías forma parte de la clave porque el menú lateral
+    # aparece en todas las páginas; la del ámbito, para invalidar solo lo afectado.
+    scope_key = PAGE_VERSION_KEY.format(scope=scope)
+    versions = cache.get_many([CATEGORY_VERSION_KEY, scope_key])
+    if scope_key not in versions:
+        versions[scope_key] = time.time_ns()
+        cache.set(scope_key, versions[scope_key], timeout=None)
+    category_version = versions.get(CATEGORY_VERSION_KEY) or _category_version()
+
+    variant = 'hx' if request.headers.get('HX-Request') else 'full'
+    path_hash = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f'store:page:{scope}:{category_version}:{versions[scope_key]}:{variant}:{path_hash}'
+
+
+def cache_anonymous_page(scope_for):
+    """
+    Decorador de vistas que cachea la respuesta completa para visitantes
+    anónimos. `scope_for(request, *args, **kwargs)` devuelve el ámbito de la
+    página (ver home_scope, category_scope, product_scope), que las señales
+    invalidan de forma selectiva.
+
+    La página se renderiza con un marcador en lugar del token CSRF y el token
+    real de cada visitante se inserta al servirla, así que un acierto de caché
+    no toca la base de datos.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not is_page_cacheable(request):
+                return view(request, *args, **kwargs)
+
+            key = _page_cache_key(request, scope_for(request, *args, **kwargs))
+            content = cache.get(key)
+            status = 'hit'
+            if content is None:
+                status = 'miss'
+                request.csrf_token_placeholder = CSRF_PLACEHOLDER
+                response = view(request, *args, **kwargs)
+                if response.status_code != 200 or response.streaming:
+                    return _fill_csrf_token(request, response)
+                content = response.content.decode(response.charset)
+                cache.set(key, content, settings.PAGE_CACHE_TIMEOUT)
+
+            response = HttpResponse(content.replace(CSRF_PLACEHOLDER, get_token(request)))
+            response['X-Page-Cache'] = status
+            return response
+        return wrapper
+    return decorator
+
+
+def _fill_csrf_token(request, response):
+    if not response.streaming:
+        response.content = response.content.replace(CSRF_PLACEHOLDER.encode(), get_token(request).encode())
+    return response
+
+
+def bump_page_scopes(*scopes):
+    """
+    Invalida las páginas cacheadas de los ámbitos indicados.
+    """
+    version = time.time_ns()
+    cache.set_many({PAGE_VERSION_KEY.format(scope=scope): version for scope in scopes}, timeout=None)
+
+
+# --------------------
+# Caché de fragmentos: tarjetas de producto
+# --------------------
+
+CARD_TEMPLATE = 'store/partials/product_card.html'
+CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def card_cache_key(product):
+    """
+    La clave cambia cuando cambia el producto (Product.updated) o el nombre de
+    su categoría, que también aparece en la tarjeta.
+    """
+    category_hash = zlib.crc32(product.category.name.encode())
+    return f'store:card:{product.pk}:{product.updated.timestamp()}:{category_hash:x}'
+
+
+def get_card_fragments(products):
+    """
+    Precarga con un único get_many las tarjetas ya renderizadas de una página
+    de productos. Devuelve {clave: html}.
+    """
+    return cache.get_many([card_cache_key(product) for product in products])
+
+
+def render_product_card(product, fragments=None):
+    """
+    Devuelve el HTML de la tarjeta de un producto (con el marcador CSRF en
+    lugar del token), renderizándola y guardándola en la caché si no estaba
+    entre los fragmentos precargados.
+    """
+    key = card_cache_key(product)
+    html = (fragments or {}).get(key)
+    if html is None:
+        html = render_to_string(CARD_TEMPLATE, {'product': product, 'csrf_token': CSRF_PLACEHOLDER})
+        cache.set(key, html, CARD_CACHE_TIMEOUT)
+    return html
@@ -0,0 +1,265 @@
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils.functional import cached_property
+
+from . import models
+from .inventory import reserved_quantities
+from .models import Product
+
+
+# --------------------
+# Servicio del Carrito
+# --------------------
+
+CART_SESSION_KEY = 'cart'
+
+
+class CartLine:
+    """
+    Una línea del carrito enriquecida con los datos actuales del producto.
+    """
+
+    def __init__(self, product, quantity):
+        self.product = product
+        self.product_id = str(product.id)
+        self.name = product.name
+        self.quantity = quantity
+        self.price = product.price  # Precio actual (Decimal), no el guardado en la sesión
+        self.stock = product.stock
+        self.image_url = product.image.url if product.image else None
+        self.total = self.price * quantity
+
+
+class Cart:
+    """
+    Carrito guardado en la sesión como {product_id: {'quantity', 'price', 'name'}}.
+
+    Todas las vistas que necesitan productos del carrito pasan por aquí: los
+    productos se cargan una sola vez con in_bulk y los totales se calculan en
+    Decimal, igual que en el checkout. Usa get_cart(request) para obtener el
+    carrito adecuado según el usuario.
+    """
+
+    def __init__(self, request):
+        self.session = request.session
+        self.data = self.session.get(CART_SESSION_KEY, {})
+
+    def __len__(self):
+        return sum(item['quantity'] for item in self.data.values())
+
+    def __bool__(self):
+        return bool(self.data)
+
+    def quantity(self, product_id):
+        item = self.data.get(str(product_id))
+        return item['quantity'] if item else 0
+
+    def add(self, product, quantity=1):
+        product_id = str(product.id)
+        if product_id not in self.data:
+            self.data[product_id] = {'quantity': 0, 'price': str(product.price), 'name': product.name}
+        self.data[product_id]['quantity'] += quantity
+        self.save()
+
+    def set_quantity(self, product_id, quantity):
+        product_id = str(product_id)
+        if product_id in self.data:
+            self.data[product_id]['quantity'] = quantity
+            self.save(changed=product_id)
+
+    def remove(self, product_id):
+        product_id = str(product_id)
+        if product_id in self.data:
+            del self.data[product_id]
+            self.save(changed=product_id)
+            return True
+        return False
+
+    def clear(self):
+        if CART_SESSION_KEY in self.session:
+            del self.session[CART_SESSION_KEY]
+        self.data = {}
+
+    def save(self, changed=None):
+        self.session[CART_SESSION_KEY] = self.data
+        self.session.modified = True
+        self._invalidate(changed)
+
+    def _invalidate(self, changed=None):
+        """
+        Mantiene coherentes las líneas ya cargadas. Si solo cambió la cantidad
+        (o se eliminó) un producto conocido, se ajusta esa línea en memoria en
+        lugar de volver a consultar todos los productos.
+        """
+        if 'lines' not in self.__dict__:
+            return
+        if changed is None or (changed in self.data and self.get_line(changed) is None):
+            del self.__dict__['lines']
+            return
+        if changed in self.data:
+            line = self.get_line(changed)
+            line.quantity = self.data[changed]['quantity']
+            line.total = line.price * line.quantity
+        else:
+            self.__dict__['lines'] = [line for line in self.lines if line.product_id != changed]
+
+    def get_line(self, product_id):
+        """
+        Devuelve la línea de un producto (cargando las líneas si hace falta) o None.
+        """
+        product_id = str(product_id)
+        return next((line for line in self.lines if line.product_id == product_id), None)
+
+    @cached_property
+    def lines(self):
+        """
+        Líneas del carrito con su producto, en una única consulta.
+        Los productos que ya no existen se omiten.
+        """
+        products = Product.objects.in_bulk([int(key) for key in self.data])
+        return [
+            CartLine(products[int(key)], item['quantity'])
+            for key, item in self.data.items()
+            if int(key) in products
+        ]
+
+    def validate_stock(self):
+        """
+        Vuelve a cargar los productos del carrito en una sola consulta y
+        devuelve todas las faltas de stock, no solo la primera. Las unidades
+        reservadas por otros checkouts en curso no se cuentan como
+        disponibles. Las líneas del carrito se refrescan con los valores leídos.
+
+        No bloquea filas (SQLite no soporta SELECT ... FOR UPDATE): la carrera
+        entre comprobar y comprar la cierran la reserva que reserve_cart crea
+        en la misma transacción y el UPDATE condicional (stock >= n) de
+        finalize_order al descontar el stock.
+        """
+        ids = [int(key) for key in self.data]
+        products = Product.objects.in_bulk(ids)
+        reserved = reserved_quantities(ids)
+
+        lines = []
+        shortages = []
+        for key, item in self.data.items():
+            product = products.get(int(key))
+            if product is None or not product.available:
+                shortages.append({'name': item.get('name', key), 'requested': item['quantity'], 'available': 0})
+                continue
+            line = CartLine(product, item['quantity'])
+            available = line.stock - reserved.get(product.id, 0)
+            if available < line.quantity:
+                shortages.append({'name': line.name, 'requested': line.quantity, 'available': max(available, 0)})
+            lines.append(line)
+
+        self.__dict__['lines'] = lines
+        return shortages
+
+    @property
+    def subtotal(self):
+        return sum((line.total for line in self.lines), Decimal('0'))
+
+
+class PersistentCart(Cart):
+    """
+    Carrito de un usuario autenticado, guardado en las tablas Cart/CartItem.
+
+    Cada operación toca una sola fila (UPDATE ... SET quantity = quantity + 1)
+    en lugar de reescribir la sesión completa, y el carrito se conserva entre
+    dispositivos.
+    """
+
+    def __init__(self, request):
+        self.session = request.session
+        self.user = request.user
+        self.data = {
+            str(product_id): {'quantity': quantity}
+            for product_id, quantity in models.CartItem.objects.filter(
+                cart__user=self.user
+            ).values_list('product_id', 'quantity')
+        }
+
+    def _items(self, product_id=None):
+        items = models.CartItem.objects.filter(cart__user=self.user)
+        if product_id is not None:
+            items = items.filter(product_id=product_id)
+        return items
+
+    def add(self, product, quantity=1):
+        if not self._items(product.id).update(quantity=F('quantity') + quantity):
+            cart, _ = models.Cart.objects.get_or_create(user=self.user)
+            try:
+                with transaction.atomic():
+                    models.CartItem.objects.create(cart=cart, product=product, quantity=quantity)
+            except IntegrityError:
+                # Otra petición creó la fila a la vez: sumamos sobre ella
+                self._items(product.id).update(quantity=F('quantity') + quantity)
+        item = self.data.setdefault(str(product.id), {'quantity': 0})
+        item['quantity'] += quantity
+        self._invalidate()
+
+    def set_quantity(self, product_id, quantity):
+        product_id = str(product_id)
+        if product_id in self.data:
+            self._items(int(product_id)).update(quantity=quantity)
+            self.data[product_id]['quantity'] = quantity
+            self._invalidate(product_id)
+
+    def remove(self, product_id):
+        product_id = str(product_id)
+        if product_id in self.data:
+            self._items(int(product_id)).delete()
+            del self.data[product_id]
+            self._invalidate(product_id)
+            return True
+        return False
+
+    def clear(self):
+        self._items().delete()
+        self.data = {}
+        self._invalidate()
+
+
+def get_cart(request):
+    """
+    Devuelve el carrito persistente para usuarios autenticados y el de la
+    sesión para visitantes anónimos.
+    """
+    if request.user.is_authenticated:
+        return PersistentCart(request)
+    return Cart(request)
+
+
+def merge_session_cart(request, user):
+    """
+    Fusiona el carrito anónimo de la sesión con el carrito guardado del usuario
+    al iniciar sesión: las cantidades se suman y se escriben con un único
+    bulk upsert. Después, el carrito de la sesión se elimina.
+    """
+    session_cart = request.session.get(CART_SESSION_KEY)
+    if not session_cart:
+        return
+
+    cart, _ = models.Cart.objects.get_or_create(user=user)
+    existing = dict(cart.items.values_list('product_id', 'quantity'))
+    valid_ids = set(Product.objects.filter(id__in=[int(key) for key in session_cart]).values_list('id', flat=True))
+
+    items = [
+        models.CartItem(
+            cart=cart,
+            product_id=int(key),
+            quantity=existing.get(int(key), 0) + item['quantity'],
+        )
+        for key, item in session_cart.items()
+        if int(key) in valid_ids
+    ]
+    models.CartItem.objects.bulk_create(
+        items,
+        update_conflicts=True,
+        unique_fields=['cart', 'product'],
+        update_fields=['quantity'],
+    )
+
+    del request.session[CART_SESSION_KEY]
@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+
+# --------------------
+# Comprobaciones de despliegue
+# --------------------
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Las invalidaciones de la caché (categorías, páginas, tarjetas) solo llegan
+    a todos los workers si comparten la caché: avisa si sigue en memoria local.
+    """
+    backend = settings.CACHES['default']['BACKEND']
+    if backend.endswith('LocMemCache'):
+        return [
+            Warning(
+                'La caché por defecto es LocMemCache: cada proceso tiene la suya y las '
+                'invalidaciones de un worker no llegan a los demás.',
+                hint='Define DJANGO_REDIS_URL si el servidor ejecuta más de un proceso.',
+                id='store.W001',
+            )
+        ]
+    return []
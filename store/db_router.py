@@ -0,0 +1,89 @@
+import random
+from contextlib import contextmanager
+
+from asgiref.local import Local
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+# --------------------
+# Enrutado primario / réplicas
+# --------------------
+
+# Modelos cuyas lecturas pueden servirse desde una réplica: catálogo,
+# historial de órdenes e informes. Sesiones, usuarios, carritos, reservas y
+# bandejas de eventos/correos siempre se leen del primario.
+REPLICA_MODELS = {
+    'store.category',
+    'store.product',
+    'orders.order',
+    'orders.orderitem',
+    'orders.dailysales',
+    'orders.dailyproductsales',
+    'orders.dailycategorysales',
+}
+
+_state = Local()
+
+
+def replica_reads_enabled():
+    return getattr(_state, 'replica', False) and not getattr(_state, 'pinned', False)
+
+
+def pin_to_primary():
+    """
+    A partir de aquí, todas las lecturas del contexto actual van al primario.
+    """
+    _state.pinned = True
+
+
+def was_pinned():
+    return getattr(_state, 'pinned', False)
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    """
+    Permite (o no) leer de las réplicas dentro del bloque. Lo usa
+    ReplicaRoutingMiddleware para cada petición de solo lectura; fuera de
+    una petición (comandos, workers) todo se lee del primario.
+    """
+    previous = getattr(_state, 'replica', False), getattr(_state, 'pinned', False)
+    _state.replica, _state.pinned = enabled, False
+    try:
+        yield
+    finally:
+        _state.replica, _state.pinned = previous
+
+
+class PrimaryReplicaRouter:
+    """
+    Envía las lecturas de REPLICA_MODELS a una réplica cuando la petición lo
+    permite y todo lo demás al primario ('default').
+
+    Cualquier escritura fija el resto de la petición al primario ("sticky
+    primary"), igual que una transacción abierta en el primario: lo que se
+    acaba de escribir todavía no está en la réplica.
+    """
+
+    def db_for_read(self, model, **hints):
+        if (
+            settings.DATABASE_REPLICAS
+            and replica_reads_enabled()
+            and model._meta.label_lower in REPLICA_MODELS
+            and not connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return random.choice(settings.DATABASE_REPLICAS)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        pin_to_primary()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Primario y réplicas contienen los mismos datos
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Las réplicas reciben el esquema al copiarse con sync_replica
+        return db == DEFAULT_DB_ALIAS
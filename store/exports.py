@@ -0,0 +1,191 @@
+import csv
+import json
+import zlib
+from datetime import date, datetime, time, timedelta
+
+from django.utils import timezone
+
+from orders.models import OrderItem
+from .models import Product
+
+
+# --------------------
+# Exportaciones en streaming (CSV / JSONL)
+# --------------------
+
+# (cabecera, campo de values_list). Solo se leen estas columnas, sin instanciar modelos.
+PRODUCT_COLUMNS = [
+    ('id', 'id'),
+    ('sku', 'sku'),
+    ('name', 'name'),
+    ('slug', 'slug'),
+    ('category', 'category__slug'),
+    ('price', 'price'),
+    ('stock', 'stock'),
+    ('available', 'available'),
+    ('created', 'created'),
+    ('updated', 'updated'),
+]
+
+# Una fila por línea de pedido, con los datos del pedido repetidos
+ORDER_COLUMNS = [
+    ('order_id', 'order_id'),
+    ('created', 'order__created'),
+    ('customer_id', 'order__customer_id'),
+    ('customer_email', 'order__customer_email'),
+    ('total_paid', 'order__total_paid'),
+    ('product_id', 'product_id'),
+    ('sku', 'product__sku'),
+    ('product', 'product__name'),
+    ('category', 'product__category__slug'),
+    ('quantity', 'quantity'),
+    ('price', 'price'),
+]
+
+FORMATS = ('csv', 'jsonl')
+CHUNK_SIZE = 2000
+BUFFER_SIZE = 64 * 1024
+
+
+class ExportFilterError(ValueError):
+    """
+    Filtro de exportación no válido (p. ej. una fecha mal escrita).
+    """
+
+
+def parse_date(value, name):
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ExportFilterError(f'{name} debe tener el formato AAAA-MM-DD.')
+
+
+def date_range_filter(field, since=None, until=None):
+    """
+    Convierte un rango de fechas (ambos extremos incluidos) en filtros sobre
+    un DateTimeField, comparando con límites de día para usar el índice.
+    """
+    filters = {}
+    if since:
+        filters[f'{field}__gte'] = timezone.make_aware(datetime.combine(since, time.min))
+    if until:
+        filters[f'{field}__lt'] = timezone.make_aware(datetime.combine(until + timedelta(days=1), time.min))
+    return filters
+
+
+def product_rows(since=None, until=None, category=None, chunk_size=CHUNK_SIZE):
+    """
+    Productos (filtrados por fecha de actualización y categoría) como tuplas,
+    leídos por bloques con un cursor del servidor.
+    """
+    queryset = Product.objects.filter(**date_range_filter('updated', since, until))
+    if category:
+        queryset = queryset.filter(category__slug=category)
+    fields = [field for _, field in PRODUCT_COLUMNS]
+    return queryset.order_by('id').values_list(*fields).iterator(chunk_size=chunk_size)
+
+
+def order_rows(since=None, until=None, category=None, chunk_size=CHUNK_SIZE):
+    """
+    Líneas de pedido (filtradas por fecha del pedido y categoría del producto)
+    como tuplas, leídas por bloques.
+    """
+    queryset = OrderItem.objects.filter(**date_range_filter('order__created', since, until))
+    if category:
+        queryset = queryset.filter(product__category__slug=category)
+    fields = [field for _, field in ORDER_COLUMNS]
+    return queryset.order_by('order_id', 'id').values_list(*fields).iterator(chunk_size=chunk_size)
+
+
+EXPORTS = {
+    'products': (PRODUCT_COLUMNS, product_rows),
+    'orders': (ORDER_COLUMNS, order_rows),
+}
+
+
+class _Echo:
+    """
+    Pseudo-archivo para csv.writer: devuelve la línea en lugar de guardarla.
+    """
+
+    def write(self, value):
+        return value
+
+
+def _serialize(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+def csv_lines(header, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def jsonl_lines(header, rows):
+    for row in rows:
+        yield json.dumps(dict(zip(header, row)), default=_serialize, ensure_ascii=False) + '\n'
+
+
+def _buffered(lines, size=BUFFER_SIZE):
+    """
+    Agrupa las líneas en bloques de ~size bytes para no escribir (ni
+    comprimir) fila por fila. La primera línea (la cabecera en CSV) sale
+    sola y de inmediato, antes de la primera consulta: la descarga empieza
+    sin esperar a llenar el primer bloque.
+    """
+    lines = iter(lines)
+    first = next(lines, None)
+    if first is None:
+        return
+    yield first.encode('utf-8')
+
+    buffer = []
+    length = 0
+    for line in lines:
+        data = line.encode('utf-8')
+        buffer.append(data)
+        length += len(data)
+        if length >= size:
+            yield b''.join(buffer)
+            buffer = []
+            length = 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+def _gzipped(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: formato gzip
+    first = True
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if first:
+            # Sin vaciar, zlib retendría la cabecera hasta reunir más datos
+            data += compressor.flush(zlib.Z_SYNC_FLUSH)
+            first = False
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def stream_export(name, fmt='csv', compress=False, **filters):
+    """
+    Generador de bytes con la exportación `name` ('products' u 'orders') en
+    formato CSV o JSONL, opcionalmente comprimida con gzip al vuelo. La
+    memoria usada es constante sin importar el número de filas.
+    """
+    columns, rows_for = EXPORTS[name]
+    header = [column for column, _ in columns]
+    lines = (csv_lines if fmt == 'csv' else jsonl_lines)(header, rows_for(**filters))
+    chunks = _buffered(lines)
+    return _gzipped(chunks) if compress else chunks
+
+
+def export_filename(name, fmt, compress=False):
+    suffix = '.gz' if compress else ''
+    return f'{name}-{timezone.now():%Y%m%d-%H%M%S}.{fmt}{suffix}'
@@ -0,0 +1,213 @@
+import csv
+import json
+from collections import Counter
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.utils.text import slugify
+
+from .models import Category, Product
+
+
+# --------------------
+# Importación masiva de productos
+# --------------------
+
+# Columnas que se actualizan cuando el SKU ya existe. El slug no se toca para
+# no romper las URLs ya publicadas.
+UPDATE_FIELDS = ['category', 'name', 'description', 'price', 'stock', 'available', 'updated']
+
+TRUE_VALUES = {'1', 'true', 'yes', 'si', 'sí', 'y', 's'}
+FALSE_VALUES = {'0', 'false', 'no', 'n', ''}
+
+SLUG_MAX_LENGTH = Product._meta.get_field('slug').max_length
+CENTS = Decimal('0.01')
+
+
+class RowError(ValueError):
+    """
+    Fila del archivo que no se puede importar.
+    """
+
+
+def read_rows(path, fmt=None):
+    """
+    Lee un archivo CSV (con cabecera) o JSONL fila a fila, sin cargarlo entero
+    en memoria. Genera tuplas (número_de_línea, dict).
+    """
+    fmt = fmt or ('csv' if str(path).lower().endswith('.csv') else 'jsonl')
+    with open(path, encoding='utf-8', newline='') as f:
+        if fmt == 'csv':
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, row
+        else:
+            for line_number, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    row = None
+                yield line_number, row if isinstance(row, dict) else {'_error': 'JSON inválido'}
+
+
+def parse_row(row, categories):
+    """
+    Valida una fila y devuelve un Product sin guardar. `categories` es el mapa
+    {slug: id} de categorías en memoria. Lanza RowError si la fila no es válida.
+    """
+    if '_error' in row:
+        raise RowError(row['_error'])
+
+    sku = str(row.get('sku') or '').strip()
+    name = str(row.get('name') or '').strip()
+    if not sku or len(sku) > 50:
+        raise RowError('SKU vacío o demasiado largo')
+    if not name or len(name) > 200:
+        raise RowError('nombre vacío o demasiado largo')
+
+    category_slug = slugify(str(row.get('category') or ''))
+    if category_slug not in categories:
+        raise RowError(f'categoría desconocida: {row.get("category")!r}')
+
+    try:
+        price = Decimal(str(row.get('price'))).quantize(CENTS)
+        stock = int(row.get('stock') or 0)
+    except (InvalidOperation, TypeError, ValueError):
+        raise RowError('precio o stock no numérico')
+    if price < 0 or price >= 10 ** 8 or stock < 0:
+        raise RowError('precio o stock fuera de rango')
+
+    available = str(row.get('available', '1')).strip().lower()
+    if available not in TRUE_VALUES | FALSE_VALUES:
+        raise RowError(f'valor de available no válido: {available!r}')
+
+    return Product(
+        sku=sku,
+        name=name,
+        slug=slugify(row.get('slug') or name)[:SLUG_MAX_LENGTH],
+        description=str(row.get('description') or ''),
+        price=price,
+        stock=stock,
+        available=available in TRUE_VALUES,
+        category_id=categories[category_slug],
+    )
+
+
+def assign_unique_slugs(products):
+    """
+    Asigna slugs únicos a un lote de productos nuevos con una consulta por
+    ronda, no una por producto. Primero se prueba el slug del nombre; los que
+    chocan prueban "<slug>-<sku>" (único casi siempre, porque el SKU lo es) y,
+    si aun así chocan, un sufijo numérico.
+    """
+    pending = [(product, product.slug or 'producto') for product in products]
+    used = set()
+    attempt = 0
+    while pending:
+        candidates = [_slug_candidate(base, product.sku, attempt) for product, base in pending]
+        taken = set(Product.objects.filter(slug__in=candidates).values_list('slug', flat=True)) | used
+
+        next_round = []
+        for (product, base), candidate in zip(pending, candidates):
+            if candidate in taken:
+                next_round.append((product, base))
+            else:
+                used.add(candidate)
+                taken.add(candidate)
+                product.slug = candidate
+        pending = next_round
+        attempt += 1
+
+
+def _slug_candidate(base, sku, attempt):
+    if attempt == 0:
+        return base
+    suffix = slugify(sku) if attempt == 1 else f'{slugify(sku)}-{attempt}'
+    return f'{base[:SLUG_MAX_LENGTH - len(suffix) - 1]}-{suffix}'
+
+
+def import_batch(products):
+    """
+    Inserta o actualiza (por SKU) un lote de productos en una transacción con
+    un único INSERT ... ON CONFLICT. Devuelve (creados, actualizados).
+    """
+    # Si un SKU se repite en el lote, gana la última fila
+    products = list({product.sku: product for product in products}.values())
+
+    with transaction.atomic():
+        existing = dict(
+            Product.objects.filter(sku__in=[product.sku for product in products]).values_list('sku', 'slug')
+        )
+        new_products = []
+        for product in products:
+            if product.sku in existing:
+                # Mismo slug que la fila existente: el INSERT solo choca por el SKU
+                product.slug = existing[product.sku]
+            else:
+                new_products.append(product)
+        assign_unique_slugs(new_products)
+        Product.objects.bulk_create(
+            products,
+            update_conflicts=True,
+            unique_fields=['sku'],
+            update_fields=UPDATE_FIELDS,
+        )
+    return len(products) - len(existing), len(existing)
+
+
+def import_products(rows, batch_size=1000, create_categories=False, on_reject=None):
+    """
+    Importa productos desde un iterable de (número_de_línea, dict).
+
+    Las filas se acumulan en lotes de batch_size, así la memoria no depende
+    del tamaño del archivo. Las categorías se resuelven con un mapa en memoria
+    cargado una sola vez; con create_categories las desconocidas se crean.
+    on_reject(número_de_línea, fila, motivo) se llama por cada fila rechazada.
+
+    Devuelve un Counter con 'rows', 'created', 'updated' y 'rejected'.
+    """
+    categories = dict(Category.objects.values_list('slug', 'id'))
+    stats = Counter()
+    batch = []
+
+    for line_number, row in rows:
+        stats['rows'] += 1
+        if create_categories and '_error' not in row:
+            _ensure_category(row.get('category'), categories)
+        try:
+            batch.append(parse_row(row, categories))
+        except RowError as e:
+            stats['rejected'] += 1
+            if on_reject is not None:
+                on_reject(line_number, row, str(e))
+            continue
+
+        if len(batch) >= batch_size:
+            created, updated = import_batch(batch)
+            stats.update(created=created, updated=updated)
+            batch = []
+
+    if batch:
+        created, updated = import_batch(batch)
+        stats.update(created=created, updated=updated)
+    return stats
+
+
+def _ensure_category(name, categories):
+    """
+    Añade al mapa la categoría de la fila, creándola si no existe. Una
+    categoría con el mismo nombre y otro slug (editado a mano) se reutiliza en
+    lugar de chocar con la unicidad del nombre.
+    """
+    name = str(name or '').strip()
+    slug = slugify(name)
+    if not slug or slug in categories:
+        return
+    category = (
+        Category.objects.filter(slug=slug).first()
+        or Category.objects.filter(name__iexact=name).first()
+        or Category.objects.create(name=name, slug=slug)
+    )
+    categories[slug] = category.id
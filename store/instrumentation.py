@@ -0,0 +1,136 @@
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from asgiref.local import Local
+
+# --------------------
+# Métricas por petición
+# --------------------
+
+_state = Local()
+
+# Literales y listas IN (...) fuera: dos consultas con la misma forma
+# comparten huella aunque cambien los ids
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST_RE = re.compile(r'\bIN \((?:\s*(?:%s|\?|\d+)\s*,?)+\)', re.IGNORECASE)
+_SPACE_RE = re.compile(r'\s+')
+# La lista de columnas no distingue consultas y ocuparía todo el registro
+_COLUMNS_RE = re.compile(r'^SELECT (?:DISTINCT )?.*? FROM ', re.IGNORECASE | re.DOTALL)
+
+
+def fingerprint(sql):
+    """
+    Forma normalizada de una consulta SQL, sin literales ni listas de
+    parámetros, para agrupar las que solo se distinguen en los valores.
+    """
+    sql = _STRING_RE.sub('?', sql)
+    sql = _IN_LIST_RE.sub('IN (...)', sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    sql = _COLUMNS_RE.sub('SELECT ... FROM ', sql)
+    return _SPACE_RE.sub(' ', sql).strip()
+
+
+class RequestMetrics:
+    """
+    Acumula lo que cuesta una petición: número y tiempo de consultas SQL,
+    huellas repetidas y tiempo por categoría (plantillas, Stripe, SMTP).
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.fingerprints = Counter()
+        self.timings = Counter()
+        self.depth = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        # Firma de connection.execute_wrapper
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - start
+            self.queries += 1
+            self.fingerprints[sql] += 1
+
+    def duplicates(self, threshold):
+        """
+        Huellas ejecutadas al menos `threshold` veces (el síntoma de un N+1),
+        de la más repetida a la menos.
+        """
+        grouped = Counter()
+        for sql, count in self.fingerprints.items():
+            grouped[fingerprint(sql)] += count
+        return [(sql, count) for sql, count in grouped.most_common() if count >= threshold]
+
+
+def current_metrics():
+    return getattr(_state, 'metrics', None)
+
+
+@contextmanager
+def collect_metrics():
+    """
+    Registra en un RequestMetrics lo que ocurra dentro del bloque en el hilo
+    o la tarea actual. Lo usa RequestMetricsMiddleware para cada petición.
+    """
+    metrics = RequestMetrics()
+    previous = current_metrics()
+    _state.metrics = metrics
+    try:
+        yield metrics
+    finally:
+        _state.metrics = previous
+
+
+@contextmanager
+def timed(name):
+    """
+    Suma la duración del bloque a la categoría `name` de la petición actual.
+    Los bloques anidados de la misma categoría solo cuentan una vez, y fuera
+    de una petición instrumentada no hace nada.
+    """
+    metrics = current_metrics()
+    if metrics is None:
+        yield
+        return
+    metrics.depth[name] += 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.depth[name] -= 1
+        if not metrics.depth[name]:
+            metrics.timings[name] += time.perf_counter() - start
+
+
+def _wrap(cls, method_name, category):
+    original = getattr(cls, method_name)
+    if getattr(original, 'instrumented', False):
+        return
+
+    def wrapper(*args, **kwargs):
+        with timed(category):
+            return original(*args, **kwargs)
+
+    wrapper.instrumented = True
+    wrapper.__wrapped__ = original
+    setattr(cls, method_name, wrapper)
+
+
+def install_hooks():
+    """
+    Mide el renderizado de plantillas y los envíos SMTP de todas las vistas
+    (incluidas las de Django, como el reseteo de contraseña). Solo se llama
+    con la instrumentación activada; las llamadas a Stripe se miden en cada
+    sitio con timed('stripe') porque la librería no ofrece un punto estable.
+    """
+    from django.core.mail.backends.smtp import EmailBackend
+    from django.template.backends.django import Template
+
+    _wrap(Template, 'render', 'tpl')
+    _wrap(EmailBackend, 'open', 'smtp')
+    _wrap(EmailBackend, 'send_messages', 'smtp')
@@ -0,0 +1,119 @@
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import StockReservation
+
+
+# --------------------
+# Reservas de stock
+# --------------------
+
+# Clave de la sesión donde se guarda la reserva del checkout en curso
+RESERVATION_SESSION_KEY = 'stock_reservation'
+
+
+def new_reservation_token():
+    return uuid.uuid4().hex
+
+
+# Stripe rechaza sesiones de Checkout que expiran en menos de 30 minutos o en
+# más de 24 horas desde el momento de crearlas
+CHECKOUT_MIN_SECONDS = 60 * 30
+CHECKOUT_MAX_SECONDS = 60 * 60 * 24
+# Margen para absorber lo que tarda la petición a Stripe desde que se calcula la fecha
+EXPIRY_MARGIN_SECONDS = 60
+
+
+def _checkout_seconds():
+    return min(max(settings.STOCK_RESERVATION_TTL, CHECKOUT_MIN_SECONDS) + EXPIRY_MARGIN_SECONDS,
+               CHECKOUT_MAX_SECONDS - EXPIRY_MARGIN_SECONDS)
+
+
+def checkout_session_expiry(now=None):
+    """
+    Valor de expires_at para la sesión de Checkout de Stripe: nunca por
+    debajo del mínimo de Stripe, aunque la reserva se creara segundos antes.
+    """
+    return (now or timezone.now()) + timedelta(seconds=_checkout_seconds())
+
+
+def reservation_expiry(now=None):
+    """
+    Vencimiento de una reserva nueva. Se crea antes que la sesión de Checkout
+    y dura un margen más que ella, para que la reserva no caduque mientras la
+    página de pago sigue siendo válida.
+    """
+    return (now or timezone.now()) + timedelta(seconds=_checkout_seconds() + EXPIRY_MARGIN_SECONDS)
+
+
+def reserved_quantities(product_ids, exclude_token=None):
+    """
+    Devuelve {product_id: unidades reservadas} con las reservas vigentes de
+    los productos indicados, en una sola consulta agregada (resuelta con el
+    índice reservation_active_idx).
+    """
+    reservations = StockReservation.objects.filter(product_id__in=product_ids, expires_at__gt=timezone.now())
+    if exclude_token:
+        reservations = reservations.exclude(token=exclude_token)
+    return dict(
+        reservations.order_by()
+        .values('product_id')
+        .annotate(total=Sum('quantity'))
+        .values_list('product_id', 'total')
+    )
+
+
+def reserve_cart(cart, token, previous_token=None):
+    """
+    Aparta el stock de todas las líneas del carrito bajo `token`.
+
+    Debe llamarse dentro de transaction.atomic(). Las reservas anteriores del
+    mismo comprador (previous_token) se liberan primero, para que reintentar
+    el checkout no se bloquee con sus propias unidades. Devuelve la lista de
+    faltas de stock de Cart.validate_stock(); si no está vacía, no se reserva nada.
+    """
+    if previous_token:
+        release_reservation(previous_token)
+
+    shortages = cart.validate_stock()
+    if shortages:
+        return shortages
+
+    expires_at = reservation_expiry()
+    StockReservation.objects.bulk_create([
+        StockReservation(product=line.product, token=token, quantity=line.quantity, expires_at=expires_at)
+        for line in cart.lines
+    ])
+    return []
+
+
+def release_reservation(token):
+    """
+    Libera (borra) todas las reservas de un checkout. Devuelve cuántas había.
+    """
+    deleted, _ = StockReservation.objects.filter(token=token).delete()
+    return deleted
+
+
+def release_expired_reservations(batch_size=1000):
+    """
+    Borra las reservas vencidas por lotes de batch_size filas, para no
+    retener el bloqueo de escritura durante un DELETE enorme. Las reservas
+    vencidas ya no cuentan como apartadas; esto solo mantiene la tabla pequeña.
+    Devuelve el número de reservas eliminadas.
+    """
+    now = timezone.now()
+    total = 0
+    while True:
+        ids = list(
+            StockReservation.objects.filter(expires_at__lte=now)
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return total
+        deleted, _ = StockReservation.objects.filter(id__in=ids).delete()
+        total += deleted
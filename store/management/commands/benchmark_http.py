@@ -0,0 +1,219 @@
+import json
+import random
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+from django.urls import reverse
+from django.utils import timezone
+
+from orders.models import Order, OrderItem
+from store.models import Category, Product
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark HTTP de la tienda: crea una base de datos de prueba con un catálogo, lanza '
+        'sesiones concurrentes contra las URLs reales (catálogo, detalle, carrito, checkout con '
+        'Stripe simulado e historial) e imprime latencias p50/p95/p99, peticiones/s y consultas '
+        'por petición de cada endpoint en JSON. No toca db.sqlite3.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=2000, help='Productos del catálogo (por defecto: 2000).')
+        parser.add_argument('--categories', type=int, default=20, help='Categorías (por defecto: 20).')
+        parser.add_argument('--sessions', type=int, default=16,
+                            help='Sesiones simuladas concurrentes, un hilo cada una (por defecto: 16).')
+        parser.add_argument('--iterations', type=int, default=5,
+                            help='Veces que cada sesión repite su recorrido (por defecto: 5).')
+        parser.add_argument('--anonymous-share', type=float, default=0.5,
+                            help='Fracción de sesiones anónimas, que solo navegan el catálogo (por defecto: 0.5).')
+        parser.add_argument('--seed', type=int, default=0, help='Semilla aleatoria (por defecto: 0).')
+        parser.add_argument('--output', '-o', help='Guarda el JSON en este archivo además de imprimirlo.')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        directory = tempfile.TemporaryDirectory()
+        # Base de datos de prueba en un archivo (no en memoria) para que los hilos
+        # usen conexiones independientes, como los workers de un servidor real.
+        connection.settings_dict.setdefault('TEST', {})['NAME'] = f'{directory.name}/benchmark.sqlite3'
+        old_config = setup_databases(verbosity=0, interactive=False, aliases={'default'})
+        try:
+            seed_catalog(options['products'], options['categories'], options['sessions'], options['seed'])
+            result = run_benchmark(options)
+        finally:
+            connections.close_all()
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+            directory.cleanup()
+
+        output = json.dumps(result, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(output + '\n')
+        self.stdout.write(output)
+
+
+# --------------------
+# Datos de prueba
+# --------------------
+
+def seed_catalog(products, categories, users, seed):
+    rng = random.Random(seed)
+    Category.objects.bulk_create([Category(name=f'Categoría {i}', slug=f'categoria-{i}') for i in range(categories)])
+    category_ids = list(Category.objects.values_list('id', flat=True))
+    Product.objects.bulk_create(
+        [
+            Product(
+                category_id=category_ids[i % len(category_ids)],
+                name=f'Producto {rng.randrange(10 ** 6):06d}',
+                slug=f'producto-{i}',
+                sku=f'BENCH-{i}',
+                price=Decimal(rng.randrange(100, 100000)) / 100,
+                stock=10 ** 6,
+                # La plantilla de detalle necesita una imagen; no hace falta que el archivo exista
+                image='products/benchmark.jpg',
+            )
+            for i in range(products)
+        ],
+        batch_size=1000,
+    )
+    User.objects.bulk_create([User(username=f'bench-{i}', email=f'bench-{i}@example.com') for i in range(users)])
+    # Algo de historial para que purchase_history tenga filas que leer
+    product_ids = list(Product.objects.values_list('id', flat=True)[:50])
+    for user in User.objects.all():
+        for _ in range(3):
+            order = Order.objects.create(customer=user, customer_email=user.email, shipping_address='Calle 1',
+                                         total_paid=Decimal('10.00'))
+            OrderItem.objects.create(order=order, product_id=rng.choice(product_ids), quantity=1, price=Decimal('5.00'))
+
+
+# --------------------
+# Sesiones simuladas
+# --------------------
+
+def _fake_checkout_session(**kwargs):
+    return SimpleNamespace(id=f'cs_bench_{timezone.now().timestamp()}', url='https://checkout.stripe.test/pay')
+
+
+class Session:
+    """
+    Un cliente HTTP con su propia sesión que registra latencia y número de
+    consultas SQL de cada petición, agrupadas por endpoint.
+    """
+
+    def __init__(self, samples, rng, user=None):
+        self.client = Client()
+        self.samples = samples
+        self.rng = rng
+        if user is not None:
+            self.client.force_login(user)
+
+    def request(self, endpoint, method, path, expected=(200,), **kwargs):
+        queries = 0
+
+        def count(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count):
+            start = time.perf_counter()
+            response = getattr(self.client, method)(path, **kwargs)
+            elapsed = time.perf_counter() - start
+        self.samples[endpoint].append((elapsed, queries, response.status_code in expected))
+        return response
+
+    def browse(self, categories, product_slugs):
+        response = self.request('product_list', 'get', reverse('product_list'))
+        category = self.rng.choice(categories)
+        response = self.request('product_list_by_category', 'get',
+                                reverse('product_list_by_category', args=[category]))
+        next_page = response.context['next_page_url'] if response.context else None
+        if next_page:
+            self.request('product_list (cargar más)', 'get', next_page, HTTP_HX_REQUEST='true')
+        for slug in self.rng.sample(product_slugs, 3):
+            self.request('product_detail', 'get', reverse('product_detail', args=[slug]))
+
+    def buy(self, product_ids):
+        for product_id in self.rng.sample(product_ids, 2):
+            self.request('add_to_cart', 'post', reverse('add_to_cart', args=[product_id]), HTTP_HX_REQUEST='true')
+        self.request('cart_detail', 'get', reverse('cart_detail'))
+        self.request('checkout (GET)', 'get', reverse('checkout'))
+        self.request('checkout (POST)', 'post', reverse('checkout'), expected=(302,), data={'address': 'Calle 1'})
+        self.request('purchase_history', 'get', reverse('purchase_history'))
+
+
+def run_benchmark(options):
+    categories = list(Category.objects.values_list('slug', flat=True))
+    products = list(Product.objects.values_list('id', 'slug'))
+    product_ids = [product_id for product_id, _ in products]
+    product_slugs = [slug for _, slug in products]
+    users = list(User.objects.order_by('id'))
+    anonymous = round(options['sessions'] * options['anonymous_share'])
+
+    samples = defaultdict(list)
+    lock = threading.Lock()
+
+    def worker(index):
+        rng = random.Random(options['seed'] * 1000 + index)
+        local = defaultdict(list)
+        session = Session(local, rng, None if index < anonymous else users[index])
+        try:
+            for _ in range(options['iterations']):
+                session.browse(categories, product_slugs)
+                if index >= anonymous:
+                    session.buy(product_ids)
+        finally:
+            connection.close()
+        with lock:
+            for endpoint, values in local.items():
+                samples[endpoint].extend(values)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(options['sessions'])]
+    with mock.patch('stripe.checkout.Session.create', side_effect=_fake_checkout_session):
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - start
+
+    total = sum(len(values) for values in samples.values())
+    return {
+        'config': {
+            key: options[key]
+            for key in ('products', 'categories', 'sessions', 'iterations', 'anonymous_share', 'seed')
+        },
+        'wall_seconds': round(wall, 3),
+        'requests': total,
+        'requests_per_sec': round(total / wall, 1) if wall else 0,
+        'endpoints': {endpoint: _summary(values, wall) for endpoint, values in sorted(samples.items())},
+    }
+
+
+def _percentile(sorted_values, q):
+    index = min(len(sorted_values) - 1, max(0, round(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def _summary(values, wall):
+    latencies = sorted(elapsed * 1000 for elapsed, _, _ in values)
+    return {
+        'requests': len(values),
+        'errors': sum(1 for _, _, ok in values if not ok),
+        'requests_per_sec': round(len(values) / wall, 1) if wall else 0,
+        'p50_ms': round(_percentile(latencies, 50), 2),
+        'p95_ms': round(_percentile(latencies, 95), 2),
+        'p99_ms': round(_percentile(latencies, 99), 2),
+        'queries_per_request': round(sum(queries for _, queries, _ in values) / len(values), 2),
+    }
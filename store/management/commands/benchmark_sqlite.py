@@ -0,0 +1,156 @@
+import json
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+# Configuración anterior: la de Django por defecto (diario rollback, timeout de
+# 5 s del módulo sqlite3 y transacciones diferidas).
+BASELINE = {'pragmas': [], 'begin': 'BEGIN'}
+TUNED = {'pragmas': settings.SQLITE_PRAGMAS, 'begin': 'BEGIN IMMEDIATE'}
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara la concurrencia de lecturas y escrituras en SQLite con la configuración '
+        'por defecto y con los PRAGMAs/BEGIN IMMEDIATE de settings. Usa una base de datos '
+        'temporal: no toca db.sqlite3.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=8, help='Hilos lectores (por defecto: 8).')
+        parser.add_argument('--writers', type=int, default=4, help='Hilos escritores (por defecto: 4).')
+        parser.add_argument('--duration', type=float, default=5.0,
+                            help='Segundos de carga por configuración (por defecto: 5).')
+        parser.add_argument('--products', type=int, default=20000,
+                            help='Productos de la tabla de prueba (por defecto: 20000).')
+        parser.add_argument('--json', action='store_true', help='Imprime el resultado como JSON.')
+
+    def handle(self, *args, **options):
+        results = {}
+        for name, config in (('baseline', BASELINE), ('tuned', TUNED)):
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, 'bench.sqlite3')
+                _create_database(path, options['products'])
+                results[name] = _run(path, config, options)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        for name, result in results.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            for role in ('reads', 'writes'):
+                stats = result[role]
+                self.stdout.write(
+                    f"  {role:<6} {stats['ops_per_sec']:>9.0f} ops/s  p50 {stats['p50_ms']:>7.2f} ms  "
+                    f"p95 {stats['p95_ms']:>7.2f} ms  errores {stats['errors']}"
+                )
+
+
+def _create_database(path, products):
+    conn = sqlite3.connect(path)
+    conn.executescript(
+        'CREATE TABLE product (id INTEGER PRIMARY KEY, category_id INTEGER, name TEXT, stock INTEGER);'
+        'CREATE INDEX product_category_name ON product (category_id, name);'
+        'CREATE TABLE cart_item (id INTEGER PRIMARY KEY, session TEXT, product_id INTEGER, quantity INTEGER);'
+    )
+    rng = random.Random(0)
+    conn.executemany(
+        'INSERT INTO product (id, category_id, name, stock) VALUES (?, ?, ?, ?)',
+        ((i, i % 50, f'Producto {rng.random():.8f}', 1000000) for i in range(1, products + 1)),
+    )
+    conn.commit()
+    conn.close()
+
+
+def _connect(path, config):
+    # isolation_level=None: las transacciones se abren explícitamente con config['begin']
+    conn = sqlite3.connect(path, timeout=5.0, isolation_level=None, check_same_thread=False)
+    for pragma in config['pragmas']:
+        conn.execute(pragma)
+    return conn
+
+
+def _read(conn, rng, products):
+    # Página del catálogo de una categoría, como product_list
+    conn.execute(
+        'SELECT id, name, stock FROM product WHERE category_id = ? ORDER BY name LIMIT 24',
+        (rng.randrange(50),),
+    ).fetchall()
+
+
+def _write(conn, rng, products, begin):
+    # Leer stock y luego escribir, como el checkout: con BEGIN diferido, dos
+    # escritores que ya leyeron no pueden ascender el bloqueo y uno falla.
+    product_id = rng.randrange(1, products + 1)
+    conn.execute(begin)
+    try:
+        stock = conn.execute('SELECT stock FROM product WHERE id = ?', (product_id,)).fetchone()[0]
+        conn.execute('UPDATE product SET stock = ? WHERE id = ?', (stock - 1, product_id))
+        conn.execute(
+            'INSERT INTO cart_item (session, product_id, quantity) VALUES (?, ?, 1)',
+            (f's{rng.randrange(1000)}', product_id),
+        )
+        conn.execute('COMMIT')
+    except sqlite3.Error:
+        conn.execute('ROLLBACK')
+        raise
+
+
+def _run(path, config, options):
+    products = options['products']
+    deadline = time.perf_counter() + options['duration']
+    latencies = {'reads': [], 'writes': []}
+    errors = {'reads': 0, 'writes': 0}
+    lock = threading.Lock()
+
+    def worker(role, seed):
+        conn = _connect(path, config)
+        rng = random.Random(seed)
+        local, failed = [], 0
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                if role == 'reads':
+                    _read(conn, rng, products)
+                else:
+                    _write(conn, rng, products, config['begin'])
+            except sqlite3.OperationalError:
+                failed += 1
+                continue
+            local.append(time.perf_counter() - start)
+        conn.close()
+        with lock:
+            latencies[role].extend(local)
+            errors[role] += failed
+
+    threads = [threading.Thread(target=worker, args=('reads', i)) for i in range(options['readers'])]
+    threads += [threading.Thread(target=worker, args=('writes', 1000 + i)) for i in range(options['writers'])]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return {role: _summary(latencies[role], errors[role], options['duration']) for role in latencies}
+
+
+def _summary(latencies, errors, duration):
+    if len(latencies) < 2:
+        return {'ops': len(latencies), 'ops_per_sec': len(latencies) / duration, 'p50_ms': 0.0, 'p95_ms': 0.0,
+                'errors': errors}
+    quantiles = statistics.quantiles(latencies, n=100)
+    return {
+        'ops': len(latencies),
+        'ops_per_sec': len(latencies) / duration,
+        'p50_ms': quantiles[49] * 1000,
+        'p95_ms': quantiles[94] * 1000,
+        'errors': errors,
+    }
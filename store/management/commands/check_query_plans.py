@@ -0,0 +1,104 @@
+import re
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from orders.models import DailyProductSales, Order, OrderItem, OutgoingEmail, StripeEvent
+from store.models import CartItem, Product, StockReservation
+from store.pagination import encode_cursor, keyset_queryset
+
+
+# Patrones de un plan que indican recorrer toda la tabla u ordenar en memoria
+BAD_PLAN_PATTERNS = {
+    'sqlite': [
+        # Cualquier SCAN, también de un índice completo (SCAN t USING INDEX ...)
+        re.compile(r'\bSCAN\b'),
+        re.compile(r'USE TEMP B-TREE FOR ORDER BY'),
+    ],
+    'postgresql': [
+        re.compile(r'Seq Scan'),
+    ],
+}
+
+# Recorridos de índice permitidos de forma explícita: la consulta lee el índice
+# en el orden pedido y se corta con LIMIT, así que solo toca una página de filas
+ALLOWED_INDEX_SCANS = {
+    'product_list (inicio)': 'product_available_name_idx',
+}
+
+
+def hot_queries():
+    """
+    Las consultas de las rutas calientes, construidas igual que en las vistas
+    y servicios. Devuelve [(nombre, queryset)].
+    """
+    catalog = Product.objects.filter(available=True).select_related('category')
+    cursor = encode_cursor(['M', 100])
+    now = timezone.now()
+    today = date.today()
+    return [
+        ('product_list (inicio)', keyset_queryset(catalog)[:25]),
+        ('product_list (inicio, página siguiente)', keyset_queryset(catalog, cursor)[:25]),
+        ('product_list (categoría)', keyset_queryset(catalog.filter(category_id=1))[:25]),
+        ('product_list (categoría, página siguiente)', keyset_queryset(catalog.filter(category_id=1), cursor)[:25]),
+        ('product_detail', Product.objects.filter(slug='producto')),
+        ('purchase_history', Order.objects.filter(customer_id=1).order_by('-created')),
+        ('order_detail', Order.objects.filter(id=1, customer_id=1)),
+        ('order_detail (líneas)', OrderItem.objects.filter(order_id=1)),
+        ('carrito persistente', CartItem.objects.filter(cart__user_id=1)),
+        ('reservas de stock', StockReservation.objects.filter(product_id__in=[1, 2], expires_at__gt=now)
+            .values('product_id').order_by()),
+        ('eventos de Stripe pendientes', StripeEvent.objects.filter(status=StripeEvent.PENDING, next_attempt_at__lte=now)
+            .order_by('next_attempt_at')[:100]),
+        ('correos pendientes', OutgoingEmail.objects.filter(status=OutgoingEmail.PENDING, next_attempt_at__lte=now)
+            .order_by('next_attempt_at')[:100]),
+        ('informe de ventas por producto', DailyProductSales.objects.filter(date__range=(today, today))),
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        'Ejecuta EXPLAIN sobre las consultas de las rutas calientes y marca las que recorren '
+        'tablas completas u ordenan en memoria. Termina con error si hay alguna, para usarlo en CI.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-plans', action='store_true',
+                            help='Muestra el plan completo de cada consulta.')
+
+    def handle(self, *args, **options):
+        patterns = BAD_PLAN_PATTERNS.get(connection.vendor)
+        if patterns is None:
+            raise CommandError(f'Motor no soportado: {connection.vendor}.')
+
+        failures = []
+        for name, queryset in hot_queries():
+            plan = queryset.explain()
+            bad = [
+                line.strip() for line in plan.splitlines()
+                if any(p.search(line) for p in patterns) and not allowed_scan(name, queryset, line)
+            ]
+            if bad:
+                failures.append(name)
+                self.stdout.write(self.style.ERROR(f'✗ {name}: ' + ' | '.join(bad)))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'✓ {name}'))
+            if options['verbose_plans'] or bad:
+                for line in plan.splitlines():
+                    self.stdout.write(f'    {line}')
+
+        if failures:
+            raise CommandError(f'{len(failures)} consulta(s) sin índice adecuado: {", ".join(failures)}')
+
+
+def allowed_scan(name, queryset, line):
+    """
+    Si la línea del plan es el recorrido de índice permitido para esta
+    consulta en ALLOWED_INDEX_SCANS y la consulta está acotada con LIMIT.
+    """
+    index = ALLOWED_INDEX_SCANS.get(name)
+    if index is None or queryset.query.high_mark is None:
+        return False
+    return re.search(rf'\bSCAN \S+ USING (COVERING )?INDEX {re.escape(index)}\b', line) is not None
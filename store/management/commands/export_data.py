@@ -0,0 +1,51 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from store.exports import EXPORTS, FORMATS, ExportFilterError, parse_date, stream_export
+
+
+class Command(BaseCommand):
+    help = (
+        'Exporta el catálogo (products) o las líneas de pedido (orders) en CSV o JSONL, '
+        'leyendo por bloques para usar memoria constante.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', choices=sorted(EXPORTS), help='Qué exportar.')
+        parser.add_argument('--format', choices=FORMATS, default='csv',
+                            help='Formato de salida (por defecto: csv).')
+        parser.add_argument('--since', help='Fecha inicial incluida (AAAA-MM-DD).')
+        parser.add_argument('--until', help='Fecha final incluida (AAAA-MM-DD).')
+        parser.add_argument('--category', help='Slug de la categoría a exportar.')
+        parser.add_argument('--gzip', action='store_true', help='Comprime la salida con gzip.')
+        parser.add_argument('--output', '-o',
+                            help='Archivo de salida (por defecto, la salida estándar).')
+
+    def handle(self, *args, **options):
+        try:
+            filters = {
+                'since': parse_date(options['since'], '--since'),
+                'until': parse_date(options['until'], '--until'),
+                'category': options['category'],
+            }
+        except ExportFilterError as e:
+            raise CommandError(str(e))
+
+        start = time.perf_counter()
+        chunks = stream_export(options['name'], options['format'], options['gzip'], **filters)
+        output = open(options['output'], 'wb') if options['output'] else sys.stdout.buffer
+        written = 0
+        try:
+            for chunk in chunks:
+                output.write(chunk)
+                written += len(chunk)
+        finally:
+            if options['output']:
+                output.close()
+            else:
+                output.flush()
+
+        elapsed = time.perf_counter() - start
+        self.stderr.write(self.style.SUCCESS(f'{written} bytes exportados en {elapsed:.2f}s.'))
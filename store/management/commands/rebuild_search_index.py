@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from store import search
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye el índice de búsqueda FTS5 de productos a partir de la tabla store_product.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=2000,
+            help='Número de productos insertados por lote (por defecto: 2000).',
+        )
+
+    def handle(self, *args, **options):
+        if not search.search_enabled():
+            self.stderr.write('El índice FTS5 solo está disponible con SQLite; no hay nada que reconstruir.')
+            return
+
+        start = time.perf_counter()
+        total = search.rebuild_index(batch_size=options['batch_size'])
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Índice reconstruido: {total} productos en {elapsed:.2f}s.'
+        ))
@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from store.inventory import release_expired_reservations
+
+
+class Command(BaseCommand):
+    help = (
+        'Elimina por lotes las reservas de stock vencidas (checkouts que no se '
+        'pagaron a tiempo). Pensado para ejecutarse periódicamente (cron).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Reservas eliminadas por lote (por defecto: 1000).')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        total = release_expired_reservations(batch_size=options['batch_size'])
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(f'{total} reservas vencidas liberadas en {elapsed:.2f}s.'))
@@ -0,0 +1,285 @@
+import random
+import time
+from array import array
+from datetime import timedelta
+from decimal import Decimal
+from itertools import accumulate
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from orders.models import Order, OrderItem
+from store import search
+from store.cache import invalidate_categories
+from store.models import Address, Category, Product
+from store.signals import muted_delete_receivers
+
+# Prefijos que identifican los datos generados (para --clear)
+SKU_PREFIX = 'SEED-'
+CATEGORY_PREFIX = 'seed-'
+USERNAME_PREFIX = 'seed-user-'
+SESSION_PREFIX = 'seed_'
+
+WORDS = (
+    'camisa pantalón zapato bolso reloj lámpara silla mesa taza libro cuaderno mochila gorra bufanda '
+    'auricular teclado ratón monitor cable cargador altavoz cámara botella toalla almohada manta'
+).split()
+ADJECTIVES = 'rojo azul negro blanco verde clásico moderno compacto grande ligero premium básico'.split()
+CITIES = 'Madrid Lima Bogotá Quito Santiago Montevideo Asunción Caracas Panamá Guadalajara'.split()
+
+
+class Command(BaseCommand):
+    help = (
+        'Genera un catálogo y un historial de ventas sintéticos y deterministas: productos en '
+        'muchas categorías, usuarios con direcciones y órdenes cuya popularidad por producto y '
+        'por cliente sigue una distribución de Zipf. Escribe con bulk_create por bloques.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=100000, help='Productos (por defecto: 100000).')
+        parser.add_argument('--categories', type=int, default=1000, help='Categorías (por defecto: 1000).')
+        parser.add_argument('--users', type=int, default=10000, help='Usuarios (por defecto: 10000).')
+        parser.add_argument('--orders', type=int, default=200000, help='Órdenes (por defecto: 200000).')
+        parser.add_argument('--max-items', type=int, default=5, help='Líneas máximas por orden (por defecto: 5).')
+        parser.add_argument('--days', type=int, default=365,
+                            help='Días hacia atrás en los que se reparten las órdenes (por defecto: 365).')
+        parser.add_argument('--zipf', type=float, default=1.1,
+                            help='Exponente de Zipf de la popularidad de productos y clientes (por defecto: 1.1).')
+        parser.add_argument('--seed', type=int, default=42, help='Semilla aleatoria (por defecto: 42).')
+        parser.add_argument('--chunk-size', type=int, default=5000,
+                            help='Filas por bulk_create y transacción (por defecto: 5000).')
+        parser.add_argument('--password', default='seed1234',
+                            help='Contraseña de todos los usuarios generados (por defecto: seed1234).')
+        parser.add_argument('--clear', action='store_true',
+                            help='Elimina antes los datos generados por una ejecución anterior.')
+        parser.add_argument('--skip-search-index', action='store_true',
+                            help='No reconstruye el índice de búsqueda al terminar.')
+
+    def handle(self, *args, **options):
+        self.chunk_size = options['chunk_size']
+        self.rng = random.Random(options['seed'])
+        # Las fechas se generan relativas a hoy a medianoche: el resto de los datos
+        # es idéntico entre ejecuciones con la misma semilla
+        self.now = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+
+        if options['clear']:
+            self.step('Eliminando datos generados anteriormente', clear_seeded_data)
+        elif Product.objects.filter(sku__startswith=SKU_PREFIX).exists():
+            raise CommandError('Ya hay datos generados en la base de datos; usa --clear para regenerarlos.')
+
+        category_ids = self.step('Categorías', self.create_categories, options['categories'])
+        prices = self.step('Productos', self.create_products, options['products'], category_ids)
+        user_ids = self.step('Usuarios y direcciones', self.create_users, options['users'], options['password'])
+        self.step('Órdenes', self.create_orders, options, prices, user_ids)
+
+        # bulk_create no dispara señales: índice de búsqueda, cachés y estadísticas del planificador
+        if not options['skip_search_index']:
+            self.step('Índice de búsqueda', search.rebuild_index)
+        invalidate_categories()
+        self.step('ANALYZE', _analyze)
+
+    def step(self, label, function, *args):
+        start = time.perf_counter()
+        result = function(*args)
+        self.stdout.write(f'{label}: {time.perf_counter() - start:.1f}s')
+        return result
+
+    def write_chunks(self, model, objects):
+        """
+        Inserta un generador de objetos por bloques de chunk_size, cada uno en
+        su transacción. La memoria solo depende del tamaño del bloque.
+        """
+        total = 0
+        chunk = []
+        for obj in objects:
+            chunk.append(obj)
+            if len(chunk) >= self.chunk_size:
+                total += _insert(model, chunk)
+                chunk = []
+        if chunk:
+            total += _insert(model, chunk)
+        return total
+
+    # --------------------
+    # Generadores
+    # --------------------
+
+    def create_categories(self, count):
+        first_id = _next_id(Category)
+        self.write_chunks(Category, (
+            Category(id=first_id + i, name=f'Seed {i:05d} {self.rng.choice(WORDS).capitalize()}',
+                     slug=f'{CATEGORY_PREFIX}{i:05d}')
+            for i in range(count)
+        ))
+        return list(range(first_id, first_id + count))
+
+    def create_products(self, count, category_ids):
+        """
+        Devuelve el primer id y los precios en centavos como array compacto (en
+        orden de id), que las órdenes usan sin consultar la base de datos.
+        """
+        first_id = _next_id(Product)
+        prices = array('l')
+        # Categorías también con popularidad desigual: unas pocas concentran muchos productos
+        category_weights = _zipf_cumulative(len(category_ids), 0.8)
+
+        def products():
+            for i in range(count):
+                cents = int(self.rng.lognormvariate(7.5, 1.0)) + 99
+                prices.append(cents)
+                name = f'{self.rng.choice(WORDS).capitalize()} {self.rng.choice(ADJECTIVES)} {i}'
+                yield Product(
+                    id=first_id + i,
+                    category_id=category_ids[_zipf_index(self.rng, category_weights)],
+                    name=name,
+                    slug=f'seed-{i}',
+                    sku=f'{SKU_PREFIX}{i:08d}',
+                    description=f'{name}. Producto generado para pruebas de rendimiento.',
+                    price=Decimal(cents) / 100,
+                    stock=self.rng.randrange(0, 500),
+                    available=self.rng.random() > 0.05,
+                )
+
+        self.write_chunks(Product, products())
+        return first_id, prices
+
+    def create_users(self, count, password):
+        first_id = _next_id(User)
+        # Un único hash para todos: calcularlo por usuario tardaría horas
+        password_hash = make_password(password)
+        self.write_chunks(User, (
+            User(id=first_id + i, username=f'{USERNAME_PREFIX}{i}', email=f'{USERNAME_PREFIX}{i}@example.com',
+                 password=password_hash, date_joined=self.now)
+            for i in range(count)
+        ))
+
+        def addresses():
+            for i in range(count):
+                for n in range(1 if self.rng.random() < 0.8 else 2):
+                    yield Address(
+                        customer_id=first_id + i,
+                        full_name=f'Cliente {i}',
+                        street_address=f'Calle {self.rng.randrange(1, 300)} #{self.rng.randrange(1, 99)}',
+                        city=self.rng.choice(CITIES),
+                        postal_code=f'{self.rng.randrange(10000, 99999)}',
+                        country='España',
+                        is_default=n == 0,
+                    )
+
+        self.write_chunks(Address, addresses())
+        return list(range(first_id, first_id + count))
+
+    def create_orders(self, options, prices, user_ids):
+        first_product_id, product_prices = prices
+        product_weights = _zipf_cumulative(len(product_prices), options['zipf'])
+        customer_weights = _zipf_cumulative(len(user_ids), options['zipf'])
+        # El rango de popularidad no coincide con el id: los más vendidos quedan repartidos
+        product_rank = list(range(len(product_prices)))
+        self.rng.shuffle(product_rank)
+        customer_rank = list(user_ids)
+        self.rng.shuffle(customer_rank)
+
+        first_order_id = _next_id(Order)
+        shipping_cents = int(Decimal(str(settings.SHIPPING_FEE)) * 100)
+        seconds = options['days'] * 24 * 60 * 60
+        created = 0
+
+        for start in range(0, options['orders'], self.chunk_size):
+            created += self._create_order_chunk(
+                range(first_order_id + start, first_order_id + min(start + self.chunk_size, options['orders'])),
+                options, first_product_id, product_prices, product_weights, product_rank,
+                customer_weights, customer_rank, user_ids[0], shipping_cents, seconds,
+            )
+        return created
+
+    def _create_order_chunk(self, order_ids, options, first_product_id, product_prices, product_weights,
+                            product_rank, customer_weights, customer_rank, first_user_id, shipping_cents, seconds):
+        orders, items, dates = [], [], []
+        for order_id in order_ids:
+            customer_id = customer_rank[_zipf_index(self.rng, customer_weights)]
+            lines = {}
+            for _ in range(self.rng.randint(1, options['max_items'])):
+                index = product_rank[_zipf_index(self.rng, product_weights)]
+                lines[index] = lines.get(index, 0) + self.rng.choice((1, 1, 1, 2, 3))
+            total = shipping_cents
+            for index, quantity in lines.items():
+                total += product_prices[index] * quantity
+                items.append(OrderItem(order_id=order_id, product_id=first_product_id + index,
+                                       quantity=quantity, price=Decimal(product_prices[index]) / 100))
+            orders.append(Order(
+                id=order_id,
+                customer_id=customer_id,
+                customer_email=f'{USERNAME_PREFIX}{customer_id - first_user_id}@example.com',
+                shipping_address='Dirección generada',
+                stripe_checkout_session_id=f'{SESSION_PREFIX}{order_id}',
+                total_paid=Decimal(total) / 100,
+            ))
+            dates.append(self.now - timedelta(seconds=self.rng.randrange(seconds)))
+        with transaction.atomic():
+            Order.objects.bulk_create(orders)
+            OrderItem.objects.bulk_create(items)
+            # auto_now_add pone la fecha actual al insertar: las fechas históricas
+            # se escriben después (bulk_update no aplica auto_now)
+            for order, created in zip(orders, dates):
+                order.created = order.updated = created
+            Order.objects.bulk_update(orders, ['created', 'updated'])
+        return len(orders)
+
+
+# --------------------
+# Utilidades
+# --------------------
+
+def _zipf_cumulative(n, s):
+    """
+    Pesos acumulados de una distribución de Zipf sobre n rangos (el rango 1
+    es el más frecuente), para muestrear con bisect en O(log n).
+    """
+    return list(accumulate(1 / (rank ** s) for rank in range(1, n + 1)))
+
+
+def _zipf_index(rng, cumulative):
+    return rng.choices(range(len(cumulative)), cum_weights=cumulative)[0]
+
+
+def _next_id(model):
+    # Ids explícitos: deterministas y sin depender de que bulk_create devuelva las claves
+    return (model.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+
+
+def _insert(model, objs):
+    with transaction.atomic():
+        model.objects.bulk_create(objs)
+    return len(objs)
+
+
+def _analyze():
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+
+def clear_seeded_data():
+    """
+    Borra los datos generados con QuerySet.delete(), que respeta el
+    on_delete de cada relación, dentro de una transacción. Las líneas de las
+    órdenes van primero para que el borrado de órdenes y productos no tenga
+    que recorrerlas en cascada.
+
+    Los receptores post_delete de la tienda se silencian (costarían varias
+    consultas por producto): las filas del índice de búsqueda se quitan con
+    una sola sentencia y las cachés las invalida handle() al terminar.
+    """
+    with transaction.atomic(), muted_delete_receivers():
+        orders = Order.objects.filter(stripe_checkout_session_id__startswith=SESSION_PREFIX)
+        OrderItem.objects.filter(order__in=orders).delete()
+        orders.delete()
+        products = Product.objects.filter(sku__startswith=SKU_PREFIX)
+        search.remove_products(products)
+        products.delete()
+        Category.objects.filter(slug__startswith=CATEGORY_PREFIX).delete()
+        User.objects.filter(username__startswith=USERNAME_PREFIX).delete()
@@ -0,0 +1,59 @@
+import os
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+
+class Command(BaseCommand):
+    help = (
+        'Copia la base de datos SQLite principal a las réplicas de DATABASE_REPLICAS con la '
+        'API de backup de SQLite. Cada réplica se reemplaza de forma atómica, así los lectores '
+        'nunca ven una copia a medias.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true',
+                            help='Repite la copia indefinidamente para mantener las réplicas al día.')
+        parser.add_argument('--interval', type=float, default=2.0,
+                            help='Segundos entre copias con --loop (por defecto: 2).')
+
+    def handle(self, *args, **options):
+        primary = settings.DATABASES[DEFAULT_DB_ALIAS]
+        replicas = [settings.DATABASES[alias] for alias in settings.DATABASE_REPLICAS]
+        if not replicas:
+            raise CommandError('No hay réplicas configuradas (define DJANGO_SQLITE_REPLICA=1).')
+        engines = {primary['ENGINE']} | {replica['ENGINE'] for replica in replicas}
+        if engines != {'django.db.backends.sqlite3'}:
+            raise CommandError('sync_replica solo sirve para réplicas SQLite locales.')
+
+        while True:
+            start = time.perf_counter()
+            for replica in replicas:
+                copy_database(str(primary['NAME']), str(replica['NAME']))
+            elapsed = time.perf_counter() - start
+            self.stdout.write(f'{len(replicas)} réplica(s) sincronizada(s) en {elapsed:.2f}s.')
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+
+def copy_database(source_path, target_path):
+    """
+    Copia source en un archivo temporal con la API de backup (consistente
+    aunque haya escrituras en curso) y lo mueve sobre target con os.replace.
+    """
+    tmp_path = f'{target_path}.tmp'
+    source = sqlite3.connect(source_path)
+    target = sqlite3.connect(tmp_path)
+    try:
+        source.backup(target)
+        # La réplica solo se lee: diario clásico, sin archivos -wal/-shm que
+        # pudieran quedar desfasados tras el reemplazo.
+        target.execute('PRAGMA journal_mode=DELETE')
+    finally:
+        target.close()
+        source.close()
+    os.replace(tmp_path, target_path)
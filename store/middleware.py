@@ -0,0 +1,103 @@
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from .db_router import replica_reads, was_pinned
+from .instrumentation import collect_metrics, install_hooks
+
+logger = logging.getLogger('store.requests')
+
+
+# --------------------
+# Réplicas de lectura
+# --------------------
+
+PIN_COOKIE = 'db_primary_pin'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Habilita las lecturas desde réplicas en las peticiones de solo lectura.
+
+    Si la petición escribe algo (o no es GET/HEAD/OPTIONS), la respuesta
+    incluye una cookie que mantiene al cliente en el primario durante
+    REPLICA_PIN_SECONDS, así ve sus propios cambios aunque la réplica aún no
+    los tenga. Sin réplicas configuradas, el middleware se desactiva.
+    """
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        enabled = request.method in SAFE_METHODS and PIN_COOKIE not in request.COOKIES
+        with replica_reads(enabled):
+            response = self.get_response(request)
+            wrote = was_pinned()
+
+        if wrote or request.method not in SAFE_METHODS:
+            response.set_cookie(
+                PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS, httponly=True, samesite='Lax',
+            )
+        return response
+
+
+# --------------------
+# Instrumentación por petición
+# --------------------
+
+class RequestMetricsMiddleware:
+    """
+    Mide cada petición: consultas SQL (con connection.execute_wrapper en
+    todas las bases de datos), plantillas, Stripe y SMTP. Lo devuelve en la
+    cabecera Server-Timing, que las herramientas del navegador muestran en
+    la pestaña de red, y registra en el logger 'store.requests' las
+    peticiones que superan REQUEST_METRICS_SLOW_MS o
+    REQUEST_METRICS_MAX_QUERIES, con las consultas repetidas.
+
+    Con REQUEST_METRICS_ENABLED = False el middleware se desactiva y no
+    cuesta nada. El tiempo de plantillas incluye las consultas perezosas
+    que se ejecutan al renderizar.
+    """
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        install_hooks()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        with collect_metrics() as metrics, ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(metrics))
+            response = self.get_response(request)
+        total = time.perf_counter() - start
+
+        response['Server-Timing'] = server_timing(metrics, total)
+        if total * 1000 >= settings.REQUEST_METRICS_SLOW_MS or metrics.queries > settings.REQUEST_METRICS_MAX_QUERIES:
+            log_request(request, response, metrics, total)
+        return response
+
+
+def server_timing(metrics, total):
+    entries = [f'db;dur={metrics.sql_time * 1000:.1f};desc="{metrics.queries} consultas"']
+    entries += [f'{name};dur={seconds * 1000:.1f}' for name, seconds in sorted(metrics.timings.items())]
+    entries.append(f'total;dur={total * 1000:.1f}')
+    return ', '.join(entries)
+
+
+def log_request(request, response, metrics, total):
+    duplicates = metrics.duplicates(settings.REQUEST_METRICS_DUPLICATE_THRESHOLD)
+    lines = [
+        f'{request.method} {request.path} {response.status_code}: {total * 1000:.0f} ms, '
+        f'{metrics.queries} consultas en {metrics.sql_time * 1000:.0f} ms'
+    ]
+    lines += [f'  {count}x {sql[:300]}' for sql, count in duplicates[:5]]
+    logger.warning('\n'.join(lines))
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0003_persistent_cart'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockReservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(db_index=True, max_length=32)),
+                ('quantity', models.PositiveIntegerField()),
+                ('expires_at', models.DateTimeField(db_index=True)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='store.product')),
+            ],
+            options={
+                'verbose_name': 'reserva de stock',
+                'verbose_name_plural': 'reservas de stock',
+                'indexes': [models.Index(fields=['product', 'expires_at', 'quantity'], name='reservation_active_idx')],
+                'constraints': [models.UniqueConstraint(fields=('token', 'product'), name='unique_reservation_product')],
+            },
+        ),
+    ]
@@ -1,6 +1,6 @@
 from django.db import models
 # Importamos Index para usar en la clase Meta de Product
-from django.db.models import Index
+from django.db.models import Index, Q
 from django.utils.text import slugify
 from django.contrib.auth.models import User
 from django.urls import reverse
@@ -52,9 +52,14 @@ class Product(models.Model):
         verbose_name = 'producto'
         verbose_name_plural = 'productos'
 
-        # CORRECCIÓN: Reemplazamos index_together por 'indexes'
+        # Índices de los accesos reales (ver el comando check_query_plans).
+        # Son parciales: solo indexan productos disponibles, que es lo único
+        # que lista el catálogo, y ya vienen en el orden de la paginación.
         indexes = [
-            Index(fields=['id', 'slug']),
+            # product_list por categoría: available + category + ORDER BY name, id
+            Index(fields=['category', 'name', 'id'], condition=Q(available=True), name='product_catalog_idx'),
+            # product_list sin categoría: available + ORDER BY name, id
+            Index(fields=['name', 'id'], condition=Q(available=True), name='product_available_name_idx'),
         ]
 
     def __str__(self):
@@ -90,6 +95,68 @@ class Address(models.Model):
         return f'{self.full_name}, {self.street_address}, {self.city}'
 
 
+# ------------------------------------
+# NUEVOS MODELOS: Cart y CartItem (carrito persistente de usuarios autenticados)
+# ------------------------------------
+class Cart(models.Model):
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='cart')
+    created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'carrito'
+        verbose_name_plural = 'carritos'
+
+    def __str__(self):
+        return f'Carrito de {self.user}'
+
+
+class CartItem(models.Model):
+    cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='items')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='cart_items')
+    quantity = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        verbose_name = 'línea de carrito'
+        verbose_name_plural = 'líneas de carrito'
+        constraints = [
+            models.UniqueConstraint(fields=['cart', 'product'], name='unique_cart_product'),
+        ]
+
+    def __str__(self):
+        return f'{self.product} ({self.quantity})'
+
+
+# ------------------------------------
+# NUEVO MODELO: StockReservation (reservas de stock durante el pago)
+# ------------------------------------
+class StockReservation(models.Model):
+    """
+    Unidades apartadas para un checkout en curso. Mientras no expiren, no
+    cuentan como disponibles para otros compradores; al confirmarse el pago
+    se convierten en venta (se borran y se descuenta Product.stock).
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='reservations')
+    token = models.CharField(max_length=32, db_index=True)
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField(db_index=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'reserva de stock'
+        verbose_name_plural = 'reservas de stock'
+        constraints = [
+            models.UniqueConstraint(fields=['token', 'product'], name='unique_reservation_product'),
+        ]
+        indexes = [
+            # Cubre la suma de reservas activas por producto sin leer la tabla
+            Index(fields=['product', 'expires_at', 'quantity'], name='reservation_active_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.quantity} x {self.product} hasta {self.expires_at}'
+
+
 # ------------------------------------
 # Modelos de Órdenes y Contacto (sin cambios)
 # ------------------------------------
@@ -0,0 +1,179 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Max, Q
+from django.utils.functional import cached_property
+
+
+# --------------------
+# Paginación por cursor (keyset)
+# --------------------
+
+def encode_cursor(values):
+    """
+    Codifica los valores de la última fila de una página en un token opaco
+    apto para la URL (?after=...).
+    """
+    raw = json.dumps(list(values), separators=(',', ':'), default=str)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token, size):
+    """
+    Decodifica un token generado por encode_cursor. Devuelve None si el token
+    está mal formado, para que la vista simplemente muestre la primera página.
+    """
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        return None
+    if not isinstance(values, list) or len(values) != size:
+        return None
+    return values
+
+
+class KeysetPage:
+    """
+    Una página de resultados obtenida con paginación por cursor.
+    """
+
+    def __init__(self, items, next_cursor):
+        self.items = items
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def keyset_paginate(queryset, after=None, per_page=24, fields=('name', 'id')):
+    """
+    Pagina un queryset ordenado por `fields` (ascendente) sin usar OFFSET.
+
+    La última columna de `fields` debe ser única (normalmente el PK) para que
+    el orden sea total. Cada página cuesta lo mismo sin importar lo profundo
+    que haya navegado el usuario: la base de datos salta directamente al
+    cursor usando el índice en lugar de recorrer y descartar filas.
+    """
+    queryset = keyset_queryset(queryset, after, fields)
+
+    # Pedimos una fila extra para saber si existe una página siguiente
+    items = list(queryset[:per_page + 1])
+    next_cursor = None
+    if len(items) > per_page:
+        items = items[:per_page]
+        last = items[-1]
+        next_cursor = encode_cursor(_field_value(last, field) for field in fields)
+
+    return KeysetPage(items, next_cursor)
+
+
+def keyset_queryset(queryset, after=None, fields=('name', 'id')):
+    """
+    El queryset ordenado y filtrado a partir del cursor, sin cortar. Es la
+    consulta que ejecuta keyset_paginate (check_query_plans revisa su plan).
+    """
+    queryset = queryset.order_by(*fields)
+    cursor = _clean_cursor(queryset.model, fields, decode_cursor(after, len(fields)))
+
+    if cursor is not None:
+        # (a, b) > (x, y)  <=>  a > x OR (a = x AND b > y), generalizado a N columnas
+        condition = Q()
+        for i, field in enumerate(fields):
+            clause = Q(**{f'{field}__gt': cursor[i]})
+            for previous, value in zip(fields[:i], cursor[:i]):
+                clause &= Q(**{previous: value})
+            condition |= clause
+        # La cota redundante sobre la primera columna permite que el motor
+        # salte directamente al cursor en el índice: con solo el OR, SQLite
+        # recorre el índice desde el principio.
+        queryset = queryset.filter(Q(**{f'{fields[0]}__gte': cursor[0]}) & condition)
+    return queryset
+
+
+def _clean_cursor(model, fields, values):
+    """
+    Convierte los valores del cursor al tipo de cada campo del orden. El token
+    viene de la URL y el usuario puede editarlo: si algún valor no encaja
+    (p. ej. texto donde va el id) se devuelve None y se muestra la primera página.
+    """
+    if values is None:
+        return None
+    try:
+        cleaned = [_cursor_field(model, field).to_python(value) for field, value in zip(fields, values)]
+    except (ValidationError, TypeError, ValueError):
+        return None
+    if any(value is None or isinstance(value, (list, dict)) for value in cleaned):
+        return None
+    return cleaned
+
+
+def _cursor_field(model, name):
+    try:
+        field = model._meta.get_field(name)
+    except FieldDoesNotExist:
+        # 'pk' u otros alias: se valida contra la clave primaria
+        return model._meta.pk
+    # En una FK el cursor guarda el id del objeto relacionado
+    return field.target_field if field.is_relation else field
+
+
+def _field_value(obj, field):
+    value = getattr(obj, field)
+    return value.pk if hasattr(value, 'pk') else value
+
+
+# --------------------
+# Conteo estimado para el admin
+# --------------------
+
+def estimated_row_count(model, using='default'):
+    """
+    Número aproximado de filas de la tabla de un modelo sin recorrerla:
+    las estadísticas del planificador en PostgreSQL y MAX(pk) (un salto al
+    final del índice de la clave primaria) en el resto de motores.
+    """
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [model._meta.db_table])
+            row = cursor.fetchone()
+        if row and row[0] >= 0:
+            return row[0]
+    return model._default_manager.using(using).aggregate(last=Max('pk'))['last'] or 0
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginador para changelists de tablas grandes.
+
+    Sin filtros, el total es una estimación (estimated_row_count). Con filtros
+    o búsqueda se cuenta como mucho hasta `limit` filas con un COUNT sobre una
+    subconsulta con LIMIT, así el coste queda acotado aunque el filtro
+    coincida con millones de filas. Úsalo junto con show_full_result_count = False.
+    """
+
+    limit = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_row_count(queryset.model, queryset.db)
+            if estimate > self.limit:
+                return estimate
+        # Tablas pequeñas o resultados filtrados: conteo exacto, pero acotado
+        return queryset.values('pk').order_by()[:self.limit].count()
@@ -0,0 +1,162 @@
+import re
+
+from django.db import connection, transaction
+
+from .models import Product
+
+
+# --------------------
+# Búsqueda de texto completo (SQLite FTS5)
+# --------------------
+
+# Tabla virtual FTS5 con una fila por producto (rowid = Product.id).
+# Se crea en la migración 0002_product_search_index.
+FTS_TABLE = 'store_product_fts'
+
+# Pesos de bm25 por columna (name, description, sku): el nombre y el SKU
+# pesan más que una coincidencia perdida en la descripción.
+BM25_WEIGHTS = (10.0, 1.0, 5.0)
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# Última página de resultados que se puede pedir: más allá el ranking ya no
+# aporta nada y el OFFSET crecería sin límite (un número enorme ni siquiera
+# cabe en un entero de SQLite).
+MAX_PAGES = 50
+
+
+def search_enabled():
+    """
+    El índice FTS5 solo existe cuando la base de datos es SQLite.
+    """
+    return connection.vendor == 'sqlite'
+
+
+def build_match_expression(query):
+    """
+    Convierte el texto del usuario en una expresión MATCH segura.
+
+    Cada palabra se cita (para que operadores como AND, NEAR o comillas sueltas
+    no rompan la consulta) y se busca por prefijo, de modo que "lap" encuentre
+    "Laptop".
+    """
+    terms = TOKEN_RE.findall(query or '')
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def index_product(product):
+    """
+    Inserta o reemplaza la fila del índice para un producto.
+    """
+    if not search_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [product.pk])
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, name, description, sku) VALUES (%s, %s, %s, %s)',
+            [product.pk, product.name, product.description, product.sku],
+        )
+
+
+def remove_product(product_id):
+    """
+    Elimina la fila del índice de un producto borrado.
+    """
+    if not search_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [product_id])
+
+
+def remove_products(products):
+    """
+    Elimina con una sola sentencia las filas del índice de un queryset de
+    productos, antes de borrarlos en bloque sin señales.
+    """
+    if not search_enabled():
+        return
+    sql, params = products.values('pk').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({sql})', params)
+
+
+def rebuild_index(batch_size=2000):
+    """
+    Reconstruye el índice completo a partir de store_product.
+
+    Lee los productos por lotes con values_list (sin instanciar modelos) y los
+    inserta con executemany dentro de una única transacción. Devuelve el
+    número de productos indexados.
+    """
+    if not search_enabled():
+        return 0
+
+    rows = (
+        Product.objects.order_by()
+        .values_list('id', 'name', 'description', 'sku')
+        .iterator(chunk_size=batch_size)
+    )
+    total = 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                _insert_rows(cursor, batch)
+                total += len(batch)
+                batch = []
+        if batch:
+            _insert_rows(cursor, batch)
+            total += len(batch)
+        # Compacta los segmentos del índice tras la carga masiva
+        cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+    return total
+
+
+def _insert_rows(cursor, rows):
+    cursor.executemany(
+        f'INSERT INTO {FTS_TABLE} (rowid, name, description, sku) VALUES (%s, %s, %s, %s)',
+        rows,
+    )
+
+
+def search_products(query, page=1, per_page=24):
+    """
+    Busca productos disponibles ordenados por relevancia (bm25).
+
+    Devuelve una tupla (productos, hay_pagina_siguiente). Solo se piden a la
+    base de datos las filas de la página solicitada, y las páginas fuera de
+    1..MAX_PAGES están vacías.
+    """
+    match = build_match_expression(query)
+    if not match or not 1 <= page <= MAX_PAGES:
+        return [], False
+
+    offset = (page - 1) * per_page
+
+    if not search_enabled():
+        # Respaldo para otros motores: sin índice, pero con el mismo contrato
+        ids = list(
+            Product.objects.filter(available=True, name__icontains=query.strip())
+            .values_list('id', flat=True)[offset:offset + per_page + 1]
+        )
+    else:
+        weights = ', '.join(str(weight) for weight in BM25_WEIGHTS)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT p.id FROM {FTS_TABLE} f '
+                f'JOIN {Product._meta.db_table} p ON p.id = f.rowid '
+                f'WHERE {FTS_TABLE} MATCH %s AND p.available '
+                f'ORDER BY bm25({FTS_TABLE}, {weights}), p.id '
+                f'LIMIT %s OFFSET %s',
+                [match, per_page + 1, offset],
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+
+    has_next = len(ids) > per_page and page < MAX_PAGES
+    ids = ids[:per_page]
+
+    # Una sola consulta para traer los productos, respetando el orden del ranking
+    products = Product.objects.select_related('category').in_bulk(ids)
+    return [products[pk] for pk in ids if pk in products], has_next
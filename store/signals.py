@@ -0,0 +1,145 @@
+from contextlib import contextmanager
+
+from django.contrib.auth.signals import user_logged_in
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import search
+from .cart import merge_session_cart
+from .thumbnails import get_thumbnails
+from .cache import (
+    bump_page_scopes, category_scope, get_category_slug, home_scope, invalidate_categories, product_scope,
+)
+from .models import Category, Product
+
+
+# --------------------
+# Sincronización del índice de búsqueda
+# --------------------
+
+@receiver(post_save, sender=Product)
+def update_product_search_index(sender, instance, raw=False, **kwargs):
+    """
+    Mantiene la fila FTS del producto al día tras cada guardado.
+    """
+    if raw:
+        # loaddata: el índice se reconstruye luego con rebuild_search_index
+        return
+    search.index_product(instance)
+
+
+@receiver(post_save, sender=Product)
+def generate_product_thumbnails(sender, instance, raw=False, **kwargs):
+    """
+    Genera las miniaturas al subir la imagen, para que la primera visita al
+    catálogo no pague el coste de redimensionarla. Los guardados que no cambian
+    la imagen no hacen nada.
+    """
+    if raw or not instance.image or instance.image.name == getattr(instance, '_previous_image', None):
+        return
+    get_thumbnails(instance.image)
+
+
+@receiver(post_delete, sender=Product)
+def remove_product_from_search_index(sender, instance, **kwargs):
+    """
+    Quita el producto borrado del índice de búsqueda.
+    """
+    search.remove_product(instance.pk)
+
+
+# --------------------
+# Invalidación de la caché de categorías
+# --------------------
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_navigation(sender, **kwargs):
+    """
+    Cualquier alta, cambio o baja de una categoría publica una nueva versión
+    del menú cacheado.
+    """
+    invalidate_categories()
+
+
+# --------------------
+# Carrito persistente
+# --------------------
+
+@receiver(user_logged_in)
+def merge_cart_on_login(sender, request, user, **kwargs):
+    """
+    Al iniciar sesión, el carrito anónimo se fusiona con el carrito guardado.
+    """
+    if request is not None and hasattr(request, 'session'):
+        merge_session_cart(request, user)
+
+
+# --------------------
+# Invalidación selectiva de la caché de páginas
+# --------------------
+
+@receiver(pre_save, sender=Product)
+def remember_previous_product_state(sender, instance, raw=False, **kwargs):
+    """
+    Guarda el slug y la categoría anteriores para invalidar también las
+    páginas de las que el producto desaparece (cambio de slug o de categoría),
+    y la imagen anterior para no regenerar miniaturas que no han cambiado.
+    """
+    instance._previous_page_scopes = ()
+    instance._previous_image = None
+    if raw or instance.pk is None:
+        return
+    previous = Product.objects.filter(pk=instance.pk).values_list('slug', 'category_id', 'image').first()
+    if previous:
+        instance._previous_page_scopes = (product_scope(previous[0]), category_scope(get_category_slug(previous[1])))
+        instance._previous_image = previous[2]
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_product_pages(sender, instance, raw=False, **kwargs):
+    """
+    Invalida solo la página de detalle del producto, el listado de su
+    categoría y el listado principal.
+
+    La categoría se resuelve con el mapa cacheado a partir de category_id:
+    cargar instance.category costaría una consulta por producto en los
+    borrados masivos y en cascada.
+    """
+    if raw:
+        return
+    scopes = {product_scope(instance.slug), home_scope()}
+    category_slug = get_category_slug(instance.category_id)
+    if category_slug is not None:
+        # Sin slug, la categoría se está borrando: su señal ya invalida todas las páginas
+        scopes.add(category_scope(category_slug))
+    scopes.update(getattr(instance, '_previous_page_scopes', ()))
+    transaction.on_commit(lambda: bump_page_scopes(*scopes))
+
+
+# --------------------
+# Borrados masivos
+# --------------------
+
+@contextmanager
+def muted_delete_receivers():
+    """
+    Desconecta los receptores post_delete de productos y categorías dentro del
+    bloque: en un borrado masivo costarían consultas por fila. Quien lo usa se
+    encarga después del índice de búsqueda y de las cachés (ver seed_store).
+    Afecta a todo el proceso, así que solo es para comandos de gestión.
+    """
+    receivers = [
+        (remove_product_from_search_index, Product),
+        (invalidate_product_pages, Product),
+        (invalidate_category_navigation, Category),
+    ]
+    for function, sender in receivers:
+        post_delete.disconnect(function, sender=sender)
+    try:
+        yield
+    finally:
+        for function, sender in receivers:
+            post_delete.connect(function, sender=sender)
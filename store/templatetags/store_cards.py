@@ -0,0 +1,21 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from store.cache import CSRF_PLACEHOLDER, render_product_card
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def product_card(context, product):
+    """
+    Renderiza la tarjeta de un producto desde la caché de fragmentos.
+
+    Uso: {% product_card product %}
+
+    Usa los fragmentos precargados por la vista en `card_fragments` (un solo
+    get_many por página) y solo renderiza las tarjetas que falten. El token
+    CSRF del visitante se inserta al final.
+    """
+    html = render_product_card(product, context.get('card_fragments'))
+    return mark_safe(html.replace(CSRF_PLACEHOLDER, str(context.get('csrf_token', ''))))
@@ -0,0 +1,32 @@
+from django import template
+from django.utils.html import format_html
+
+from store.thumbnails import get_thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def responsive_image(image, alt='', css_class='', sizes='100vw', width=400, lazy=True):
+    """
+    Renderiza un <img> con srcset de miniaturas WebP de la imagen.
+
+    Uso: {% responsive_image product.image product.name "product-image" "280px" %}
+
+    El src apunta a la miniatura más cercana a `width` (para navegadores sin
+    soporte de srcset). Si no se pudieron generar miniaturas, se usa la
+    imagen original. Con lazy=False la imagen se carga de inmediato (útil para
+    la imagen principal de una página).
+    """
+    loading = 'lazy' if lazy else 'eager'
+    thumbnails = get_thumbnails(image)
+    if not thumbnails:
+        return format_html('<img src="{}" alt="{}" class="{}" loading="{}" decoding="async">',
+                           image.url, alt, css_class, loading)
+
+    src_width = min(thumbnails, key=lambda w: abs(w - width))
+    srcset = ', '.join(f'{url} {w}w' for w, url in sorted(thumbnails.items()))
+    return format_html(
+        '<img src="{}" srcset="{}" sizes="{}" alt="{}" class="{}" loading="{}" decoding="async">',
+        thumbnails[src_width], srcset, sizes, alt, css_class, loading,
+    )
@@ -0,0 +1,39 @@
+from decimal import Decimal
+from types import SimpleNamespace
+
+from django.contrib.sessions.backends.base import SessionBase
+from django.core.cache import cache
+from django.utils.text import slugify
+
+from .cart import Cart
+from .models import Category, Product
+
+
+# --------------------
+# Datos comunes de los tests (store y orders)
+# --------------------
+
+class StoreDataMixin:
+    """
+    Una categoría y un producto con stock, con la caché vacía en cada test.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Ropa', slug='ropa')
+        self.product = self.create_product('Camisa', stock=5)
+
+    def create_product(self, name, price='10.00', stock=3, **fields):
+        slug = fields.pop('slug', None) or slugify(name)
+        fields.setdefault('category', self.category)
+        return Product.objects.create(
+            name=name, slug=slug, sku=fields.pop('sku', slug.upper()), price=Decimal(price), stock=stock, **fields,
+        )
+
+    def cart_with(self, product, quantity):
+        """
+        Carrito de sesión (sin petición real) con `quantity` unidades del producto.
+        """
+        cart = Cart(SimpleNamespace(session=SessionBase()))
+        cart.add(product, quantity)
+        return cart
@@ -1,3 +1,794 @@
-from django.test import TestCase
+import gzip
+import json
+import re
+import tempfile
+import zlib
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from orders.models import Order, OrderItem
+from orders.services import finalize_order
+
+from . import importer, models, search
+from .cache import (
+    CSRF_PLACEHOLDER, card_cache_key, get_card_fragments, get_category_navigation, render_product_card,
+)
+from .checks import check_shared_cache
+from .db_router import PrimaryReplicaRouter, replica_reads, was_pinned
+from .exports import _buffered
+from .instrumentation import fingerprint, timed
+from .inventory import (
+    CHECKOUT_MIN_SECONDS, checkout_session_expiry, release_expired_reservations, reservation_expiry, reserve_cart,
+)
+from .management.commands.seed_store import clear_seeded_data
+from .middleware import PIN_COOKIE, ReplicaRoutingMiddleware, RequestMetricsMiddleware
+from .models import Category, Product, StockReservation
+from .pagination import EstimatedCountPaginator, encode_cursor, keyset_paginate
+from .testing import StoreDataMixin
+from .thumbnails import get_thumbnails
+
+
+# --------------------
+# Paginación por cursor
+# --------------------
+
+class KeysetPaginationTests(StoreDataMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        for i in range(5):
+            self.create_product(f'Pantalón {i}', price='20.00')
+
+    def test_pages_follow_the_cursor_without_gaps(self):
+        queryset = Product.objects.all()
+        first = keyset_paginate(queryset, per_page=4)
+        second = keyset_paginate(queryset, after=first.next_cursor, per_page=4)
+        names = [p.name for p in first] + [p.name for p in second]
+        self.assertEqual(names, list(queryset.order_by('name', 'id').values_list('name', flat=True)))
+        self.assertFalse(second.has_next)
+
+    def test_malformed_cursors_fall_back_to_the_first_page(self):
+        first_page = [p.id for p in keyset_paginate(Product.objects.all(), per_page=3)]
+        for cursor in ['no-es-base64!', 'WyJhIiwieCJd', encode_cursor(['a']), encode_cursor(['a', None]),
+                       encode_cursor([['a'], {'b': 1}])]:
+            with self.subTest(cursor=cursor):
+                page = keyset_paginate(Product.objects.all(), after=cursor, per_page=3)
+                self.assertEqual([p.id for p in page], first_page)
+
+    def test_malformed_cursor_in_url_does_not_error(self):
+        response = self.client.get(reverse('product_list'), {'after': 'WyJhIiwieCJd'})
+        self.assertEqual(response.status_code, 200)
+
+
+# --------------------
+# Búsqueda de texto completo
+# --------------------
+
+class ProductSearchTests(StoreDataMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.create_product('Pantalón vaquero', description='Tela azul', sku='PAN-1')
+        self.create_product('Chaqueta', description='Combina con un pantalón', sku='CHA-1')
+        self.create_product('Pantalón corto', sku='PAN-2', available=False)
+
+    def names(self, query, **kwargs):
+        return [product.name for product in search.search_products(query, **kwargs)[0]]
+
+    def test_matches_prefixes_and_ranks_name_above_description(self):
+        self.assertEqual(self.names('pant'), ['Pantalón vaquero', 'Chaqueta'])
+        self.assertEqual(self.names('cha-1'), ['Chaqueta'])
+
+    def test_operators_in_the_query_are_searched_as_words(self):
+        self.assertEqual(self.names('"vaquero'), ['Pantalón vaquero'])
+        self.assertEqual(self.names('vaquero) NEAR('), [])
+        self.assertEqual(self.names('***'), [])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.product.name = 'Blusa'
+        self.product.save()
+        self.assertEqual(self.names('blusa'), ['Blusa'])
+        self.product.delete()
+        self.assertEqual(self.names('blusa'), [])
+
+    def test_pages_are_fetched_from_the_index(self):
+        products, has_next = search.search_products('pantalón', per_page=1)
+        self.assertEqual([p.name for p in products], ['Pantalón vaquero'])
+        self.assertTrue(has_next)
+        self.assertEqual(self.names('pantalón', page=2, per_page=1), ['Chaqueta'])
+
+    def test_last_page_has_no_next_page(self):
+        with mock.patch.object(search, 'MAX_PAGES', 1):
+            products, has_next = search.search_products('pantalón', per_page=1)
+            self.assertEqual((len(products), has_next), (1, False))
+            self.assertEqual(search.search_products('pantalón', page=2, per_page=1), ([], False))
+
+    def test_out_of_range_page_is_a_404_not_a_500(self):
+        url = reverse('product_search')
+        self.assertEqual(self.client.get(url, {'q': 'camisa', 'page': '9' * 25}).status_code, 404)
+        self.assertEqual(self.client.get(url, {'q': 'camisa', 'page': search.MAX_PAGES + 1}).status_code, 404)
+        self.assertEqual(self.client.get(url, {'q': 'camisa', 'page': search.MAX_PAGES}).status_code, 200)
+        self.assertEqual(self.client.get(url, {'q': 'camisa', 'page': '-3'}).status_code, 200)
+
+    def test_rebuild_index_restores_missing_rows(self):
+        Product.objects.filter(pk=self.product.pk).update(name='Blusa')
+        self.assertEqual(self.names('blusa'), [])
+        self.assertEqual(search.rebuild_index(), Product.objects.count())
+        self.assertEqual(self.names('blusa'), ['Blusa'])
+
+    def test_view_renders_results(self):
+        response = self.client.get(reverse('product_search'), {'q': 'vaquero'})
+        self.assertContains(response, 'Pantalón vaquero')
+        self.assertNotContains(response, 'Chaqueta')
+
+
+# --------------------
+# Menú de categorías y caché compartida
+# --------------------
+
+class CategoryNavigationTests(StoreDataMixin, TestCase):
+    def test_menu_is_cached_until_a_category_changes(self):
+        get_category_navigation()
+        with self.assertNumQueries(0):
+            self.assertEqual([c.name for c in get_category_navigation()[0]], ['Ropa'])
+
+        Category.objects.create(name='Hogar', slug='hogar')
+        self.assertIn('hogar', get_category_navigation()[1])
+
+    def test_deploy_check_warns_about_a_per_process_cache(self):
+        self.assertEqual([warning.id for warning in check_shared_cache(None)], ['store.W001'])
+        redis = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://'}}
+        with self.settings(CACHES=redis):
+            self.assertEqual(check_shared_cache(None), [])
+
+
+# --------------------
+# Servicio del carrito
+# --------------------
+
+class CartServiceTests(StoreDataMixin, TestCase):
+    def test_lines_use_current_prices_and_skip_deleted_products(self):
+        other = self.create_product('Gorra', price='4.50')
+        cart = self.cart_with(self.product, 2)
+        cart.add(other)
+        Product.objects.filter(pk=self.product.pk).update(price=Decimal('12.00'))
+        other.delete()
+
+        self.assertEqual([(line.name, line.quantity, line.total) for line in cart.lines],
+                         [('Camisa', 2, Decimal('24.00'))])
+        self.assertEqual(cart.subtotal, Decimal('24.00'))
+        self.assertEqual(len(cart), 3)
+
+    def test_quantity_changes_and_removal(self):
+        cart = self.cart_with(self.product, 1)
+        cart.set_quantity(self.product.id, 4)
+        self.assertEqual(cart.quantity(self.product.id), 4)
+        self.assertTrue(cart.remove(self.product.id))
+        self.assertFalse(cart.remove(self.product.id))
+        self.assertFalse(cart)
+
+    def test_cart_page_loads_all_products_in_one_query(self):
+        for i in range(5):
+            self.client.post(reverse('add_to_cart', args=[self.create_product(f'Taza {i}').id]))
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('cart_detail'))
+        self.assertContains(response, 'Taza 4')
+        product_queries = [q for q in queries.captured_queries if 'FROM "store_product"' in q['sql']]
+        self.assertEqual(len(product_queries), 1)
+
+
+# --------------------
+# Miniaturas de imágenes
+# --------------------
+
+def png_upload(name='foto.png', color='red'):
+    buffer = BytesIO()
+    Image.new('RGB', (300, 200), color).save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+class ThumbnailTests(StoreDataMixin, TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_root = override_settings(MEDIA_ROOT=media.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+        super().setUp()
+
+    def test_thumbnails_are_generated_only_when_the_image_changes(self):
+        with mock.patch('store.signals.get_thumbnails', wraps=get_thumbnails) as generate:
+            self.product.image = png_upload()
+            self.product.save()
+            self.assertEqual(generate.call_count, 1)
+
+            self.product.stock = 1
+            self.product.save()
+            self.assertEqual(generate.call_count, 1)
+
+            self.product.image = png_upload(color='blue')
+            self.product.save()
+            self.assertEqual(generate.call_count, 2)
+
+    def test_saving_the_product_keeps_the_cached_thumbnails(self):
+        self.product.image = png_upload()
+        self.product.save()
+        thumbnails = get_thumbnails(self.product.image)
+        self.assertEqual(sorted(thumbnails), [200])
+
+        self.product.price = Decimal('12.00')
+        self.product.save()
+        with mock.patch('store.thumbnails.generate_thumbnails') as generate:
+            self.assertEqual(get_thumbnails(Product.objects.get().image), thumbnails)
+        generate.assert_not_called()
+
+
+# --------------------
+# Carrito persistente
+# --------------------
+
+class PersistentCartTests(StoreDataMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('ana', 'ana@example.com', 'clave-segura-123')
+
+    def items(self):
+        return dict(models.CartItem.objects.filter(cart__user=self.user).values_list('product__name', 'quantity'))
+
+    def test_signed_in_cart_is_stored_in_the_database(self):
+        self.client.force_login(self.user)
+        url = reverse('add_to_cart', args=[self.product.id])
+        self.client.post(url)
+        self.client.post(url)
+        self.assertEqual(self.items(), {'Camisa': 2})
+
+        self.client.post(reverse('update_cart', args=[self.product.id]), {'action': 'decrease'})
+        self.assertEqual(self.items(), {'Camisa': 1})
+        self.client.post(reverse('remove_from_cart', args=[self.product.id]))
+        self.assertEqual(self.items(), {})
+
+    def test_login_merges_the_session_cart_into_the_saved_one(self):
+        other = self.create_product('Gorra')
+        cart = models.Cart.objects.create(user=self.user)
+        cart.items.create(product=self.product, quantity=1)
+
+        self.client.post(reverse('add_to_cart', args=[self.product.id]))
+        self.client.post(reverse('add_to_cart', args=[other.id]))
+        self.client.post(reverse('login'), {'username': 'ana', 'password': 'clave-segura-123'})
+
+        self.assertEqual(self.items(), {'Camisa': 2, 'Gorra': 1})
+        self.assertNotIn('cart', self.client.session)
+        self.assertEqual(self.client.get(reverse('get_cart_count')).content, b'3')
+
+
+# --------------------
+# Respuestas HTMX del carrito
+# --------------------
+
+class CartHtmxTests(StoreDataMixin, TestCase):
+    def post(self, name, product, data=None):
+        return self.client.post(reverse(name, args=[product.id]), data or {}, HTTP_HX_REQUEST='true')
+
+    def test_add_to_cart_updates_the_counter_out_of_band(self):
+        self.post('add_to_cart', self.product)
+        response = self.post('add_to_cart', self.product)
+        self.assertContains(response, 'Llevas 2 productos')
+        self.assertContains(response, '<span id="cart-count" hx-swap-oob="true">2</span>', html=True)
+        self.assertNotIn('HX-Trigger', response)
+
+    def test_rejected_add_does_not_touch_the_counter(self):
+        sold_out = self.create_product('Gorra', stock=0)
+        response = self.post('add_to_cart', sold_out)
+        self.assertContains(response, 'agotado')
+        self.assertNotContains(response, 'hx-swap-oob')
+
+    def test_update_returns_the_row_and_out_of_band_totals(self):
+        self.post('add_to_cart', self.product)
+        response = self.post('update_cart', self.product, {'action': 'increase'})
+        self.assertEqual(response.status_code, 200)
+        content = response.content.decode()
+        self.assertIn(f'<tr id="cart-row-{self.product.id}">', content)
+        self.assertInHTML('<span class="quantity-display">2</span>', content)
+        self.assertInHTML('<h3 class="cart-summary" id="cart-totals" hx-swap-oob="true">Total a Pagar: $20.00</h3>',
+                          content)
+        self.assertInHTML('<span id="cart-count" hx-swap-oob="true">2</span>', content)
+
+    def test_update_past_the_stock_reports_the_error_out_of_band(self):
+        limited = self.create_product('Gorra', stock=1)
+        self.post('add_to_cart', limited)
+        response = self.post('update_cart', limited, {'action': 'increase'})
+        self.assertContains(response, 'Límite de stock (1) alcanzado para Gorra.')
+        self.assertContains(response, 'id="floating-message-container" hx-swap-oob="innerHTML"')
+
+    def test_remove_returns_totals_or_refreshes_an_empty_cart(self):
+        other = self.create_product('Gorra', price='4.00')
+        self.post('add_to_cart', self.product)
+        self.post('add_to_cart', other)
+
+        response = self.post('remove_from_cart', self.product)
+        self.assertNotContains(response, '<tr')
+        self.assertContains(response, 'Total a Pagar: $4.00')
+        response = self.post('remove_from_cart', other)
+        self.assertEqual(response['HX-Refresh'], 'true')
+
+    def test_without_htmx_the_cart_redirects(self):
+        self.client.post(reverse('add_to_cart', args=[self.product.id]))
+        response = self.client.post(reverse('update_cart', args=[self.product.id]), {'action': 'increase'})
+        self.assertRedirects(response, reverse('cart_detail'))
+
+
+# --------------------
+# Caché de páginas para anónimos
+# --------------------
+
+class PageCacheTests(StoreDataMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('product_list_by_category', args=[self.category.slug])
+
+    def get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_second_visit_is_served_from_cache(self):
+        self.assertEqual(self.get(self.url)['X-Page-Cache'], 'miss')
+        with self.assertNumQueries(0):
+            response = self.get(self.url)
+        self.assertEqual(response['X-Page-Cache'], 'hit')
+
+    def test_cached_page_gets_each_visitors_csrf_token(self):
+        self.get(self.url)
+        tokens = set()
+        for _ in range(2):
+            self.client = self.client_class()
+            response = self.get(self.url)
+            self.assertEqual(response['X-Page-Cache'], 'hit')
+            content = response.content.decode()
+            self.assertNotIn(CSRF_PLACEHOLDER, content)
+            tokens.add(re.search(r'name="csrfmiddlewaretoken" value="(\w+)"', content).group(1))
+        self.assertEqual(len(tokens), 2)
+
+    def test_saving_a_product_invalidates_only_its_pages(self):
+        other = Category.objects.create(name='Hogar', slug='hogar')
+        other_list = reverse('product_list_by_category', args=[other.slug])
+        self.get(self.url)
+        self.get(other_list)
+
+        # La invalidación se publica al confirmar la transacción
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.price = Decimal('12.00')
+            self.product.save()
+
+        response = self.get(self.url)
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+        self.assertContains(response, '$12.00')
+        self.assertEqual(self.get(other_list)['X-Page-Cache'], 'hit')
+
+    def test_bulk_delete_does_not_load_each_products_category(self):
+        for i in range(5):
+            self.create_product(f'Gorra {i}')
+        self.get(self.url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with CaptureQueriesContext(connection) as queries:
+                Product.objects.all().delete()
+        self.assertEqual([q['sql'] for q in queries.captured_queries if 'FROM "store_category"' in q['sql']], [])
+        self.assertEqual(self.get(self.url)['X-Page-Cache'], 'miss')
+
+    def test_moving_a_product_invalidates_both_categories(self):
+        other = Category.objects.create(name='Hogar', slug='hogar')
+        other_list = reverse('product_list_by_category', args=[other.slug])
+        self.get(self.url)
+        self.get(other_list)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.category = other
+            self.product.save()
+        self.assertNotContains(self.get(self.url), 'Camisa')
+        self.assertContains(self.get(other_list), 'Camisa')
+
+    def test_visitors_with_a_cart_are_not_served_cached_pages(self):
+        self.get(self.url)
+        self.client.post(reverse('add_to_cart', args=[self.product.id]))
+        self.assertNotIn('X-Page-Cache', self.get(self.url))
+
+
+# --------------------
+# Caché de tarjetas de producto
+# --------------------
+
+class ProductCardCacheTests(StoreDataMixin, TestCase):
+    def test_cards_are_rendered_once_and_prefetched(self):
+        html = render_product_card(self.product)
+        self.assertIn('Camisa', html)
+        self.assertIn(CSRF_PLACEHOLDER, html)
+
+        fragments = get_card_fragments([self.product])
+        with mock.patch('store.cache.render_to_string') as render:
+            self.assertEqual(render_product_card(self.product, fragments), html)
+        render.assert_not_called()
+
+    def test_key_changes_with_the_product_and_its_category(self):
+        key = card_cache_key(self.product)
+        self.product.price = Decimal('12.00')
+        self.product.save()
+        self.assertNotEqual(card_cache_key(self.product), key)
+
+        key = card_cache_key(self.product)
+        self.category.name = 'Moda'
+        self.category.save()
+        self.assertNotEqual(card_cache_key(Product.objects.select_related('category').get()), key)
+
+    def test_listing_renders_only_missing_cards(self):
+        self.client.force_login(User.objects.create_user('ana'))
+        url = reverse('product_list')
+        self.client.get(url)
+        self.create_product('Gorra')
+
+        with mock.patch('store.cache.render_to_string', wraps=render_to_string) as render:
+            response = self.client.get(url)
+        self.assertContains(response, 'Gorra')
+        self.assertContains(response, 'Camisa')
+        self.assertEqual([call.args[1]['product'].name for call in render.call_args_list], ['Gorra'])
+
+
+# --------------------
+# Reservas de stock
+# --------------------
+
+class StockReservationTests(StoreDataMixin, TestCase):
+    def reserve(self, token, quantity):
+        with transaction.atomic():
+            return reserve_cart(self.cart_with(self.product, quantity), token)
+
+    def test_reserved_units_are_not_available_to_other_checkouts(self):
+        self.assertEqual(self.reserve('a', 4), [])
+        shortages = self.reserve('b', 2)
+        self.assertEqual(shortages, [{'name': 'Camisa', 'requested': 2, 'available': 1}])
+        self.assertEqual(StockReservation.objects.filter(token='b').count(), 0)
+
+    def test_expired_reservations_release_the_stock(self):
+        self.reserve('a', 4)
+        StockReservation.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self.reserve('b', 5), [])
+
+        self.assertEqual(release_expired_reservations(), 1)
+        self.assertEqual(list(StockReservation.objects.values_list('token', flat=True)), ['b'])
+
+    def test_retrying_checkout_replaces_previous_reservation(self):
+        self.reserve('a', 5)
+        with transaction.atomic():
+            shortages = reserve_cart(self.cart_with(self.product, 5), 'b', previous_token='a')
+        self.assertEqual(shortages, [])
+        self.assertEqual(list(StockReservation.objects.values_list('token', flat=True)), ['b'])
+
+    def test_paid_order_converts_the_reservation_into_a_sale(self):
+        self.reserve('a', 2)
+        finalize_order('cs_1', None, 'cliente@example.com', 'Calle 1', Decimal('20.00'),
+                       [(self.product.id, 2, Decimal('10.00'))], reservation='a')
+        self.assertFalse(StockReservation.objects.exists())
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 3)
+
+    def test_stripe_session_expiry_respects_minimum_and_reservation_outlasts_it(self):
+        now = timezone.now()
+        self.assertGreater(checkout_session_expiry(now) - now, timedelta(seconds=CHECKOUT_MIN_SECONDS))
+        self.assertGreater(reservation_expiry(now), checkout_session_expiry(now))
+
+
+# --------------------
+# Importación masiva
+# --------------------
+
+class ImportProductsTests(StoreDataMixin, TestCase):
+    def rows(self, *rows):
+        return enumerate(rows, start=2)
+
+    def test_upserts_by_sku_in_batches(self):
+        stats = importer.import_products(self.rows(
+            {'sku': 'GOR-1', 'name': 'Gorra', 'category': 'ropa', 'price': '4.5', 'stock': '3'},
+            {'sku': 'CAMISA', 'name': 'Camisa lino', 'category': 'Ropa', 'price': '15', 'stock': '7'},
+            {'sku': 'BUF-1', 'name': 'Bufanda', 'category': 'ropa', 'price': '9', 'stock': '1', 'available': 'no'},
+        ), batch_size=2)
+        self.assertEqual((stats['created'], stats['updated'], stats['rejected']), (2, 1, 0))
+
+        self.product.refresh_from_db()
+        # El SKU existente se actualiza sin cambiar su slug (la URL publicada)
+        self.assertEqual((self.product.name, self.product.price, self.product.slug),
+                         ('Camisa lino', Decimal('15.00'), 'camisa'))
+        self.assertFalse(Product.objects.get(sku='BUF-1').available)
+
+    def test_rejects_invalid_rows_and_keeps_going(self):
+        rejected = []
+        stats = importer.import_products(self.rows(
+            {'sku': '', 'name': 'Sin SKU', 'category': 'ropa', 'price': '1'},
+            {'sku': 'X-1', 'name': 'Precio', 'category': 'ropa', 'price': 'gratis'},
+            {'sku': 'X-2', 'name': 'Otra', 'category': 'hogar', 'price': '1'},
+            {'_error': 'JSON inválido'},
+            {'sku': 'X-3', 'name': 'Válida', 'category': 'ropa', 'price': '1'},
+        ), on_reject=lambda line, row, reason: rejected.append(line))
+        self.assertEqual((stats['rows'], stats['created'], stats['rejected']), (5, 1, 4))
+        self.assertEqual(rejected, [2, 3, 4, 5])
+
+    def test_new_products_get_unique_slugs(self):
+        importer.import_products(self.rows(
+            {'sku': 'CAM-2', 'name': 'Camisa', 'category': 'ropa', 'price': '1'},
+            {'sku': 'CAM-3', 'name': 'Camisa', 'category': 'ropa', 'price': '1'},
+        ))
+        slugs = set(Product.objects.filter(name='Camisa').values_list('slug', flat=True))
+        self.assertEqual(slugs, {'camisa', 'camisa-cam-2', 'camisa-cam-3'})
+
+    def test_reuses_a_category_with_the_same_name_and_another_slug(self):
+        moda = Category.objects.create(name='Moda Hombre', slug='hombre')
+        stats = importer.import_products(self.rows(
+            {'sku': 'GOR-1', 'name': 'Gorra', 'category': 'Moda Hombre', 'price': '4'},
+            {'sku': 'GOR-2', 'name': 'Gorra roja', 'category': 'moda hombre', 'price': '4'},
+        ), create_categories=True)
+        self.assertEqual((stats['created'], stats['rejected']), (2, 0))
+        self.assertEqual(set(Product.objects.filter(sku__startswith='GOR').values_list('category', flat=True)),
+                         {moda.id})
+        self.assertEqual(Category.objects.count(), 2)
+
+    def test_command_reads_csv_and_indexes_the_products(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', encoding='utf-8') as f:
+            f.write('sku,name,category,price,stock\nTAZ-1,Taza grande,Hogar,6.00,10\n')
+            f.flush()
+            call_command('import_products', f.name, '--create-categories', stdout=StringIO())
+
+        self.assertEqual(Product.objects.get(sku='TAZ-1').category.slug, 'hogar')
+        self.assertEqual([p.sku for p in search.search_products('taza')[0]], ['TAZ-1'])
+
+
+# --------------------
+# Exportaciones en streaming
+# --------------------
+
+class ExportTests(StoreDataMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(User.objects.create_user('staff', is_staff=True))
+        other = Category.objects.create(name='Hogar', slug='hogar')
+        mug = self.create_product('Taza', category=other)
+        order = Order.objects.create(customer_email='ana@example.com', shipping_address='Calle 1',
+                                     total_paid=Decimal('25.00'))
+        order.items.create(product=self.product, quantity=2, price=Decimal('10.00'))
+        order.items.create(product=mug, quantity=1, price=Decimal('5.00'))
+
+    def export(self, name, **params):
+        response = self.client.get(reverse('export_data', args=[name]), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+
+    def test_products_csv(self):
+        lines = self.export('products').decode().splitlines()
+        self.assertEqual(lines[0], 'id,sku,name,slug,category,price,stock,available,created,updated')
+        self.assertEqual([line.split(',')[2] for line in lines[1:]], ['Camisa', 'Taza'])
+
+    def test_orders_jsonl_filtered_by_category(self):
+        rows = [json.loads(line) for line in self.export('orders', format='jsonl', category='hogar').splitlines()]
+        self.assertEqual([(row['product'], row['quantity'], row['total_paid']) for row in rows],
+                         [('Taza', 1, '25.00')])
+
+    def test_gzip_matches_the_plain_export(self):
+        self.assertEqual(gzip.decompress(self.export('orders', gzip='1')), self.export('orders'))
+
+    def test_invalid_requests(self):
+        self.assertEqual(self.client.get(reverse('export_data', args=['products']), {'format': 'xml'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('export_data', args=['products']), {'since': 'ayer'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('export_data', args=['users'])).status_code, 404)
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('export_data', args=['products'])).status_code, 302)
+
+    def test_first_line_is_sent_alone_and_the_rest_in_bounded_chunks(self):
+        chunks = list(_buffered((f'{i:04d}\n' for i in range(10)), size=20))
+        self.assertEqual([len(chunk) for chunk in chunks], [5, 20, 20, 5])
+
+    def test_header_is_sent_before_querying_the_rows(self):
+        for params in ({}, {'gzip': '1'}):
+            with self.subTest(**params):
+                response = self.client.get(reverse('export_data', args=['orders']), params)
+                with self.assertNumQueries(0):
+                    first = next(iter(response.streaming_content))
+                if params:
+                    first = zlib.decompressobj(31).decompress(first)
+                self.assertEqual(first, b'order_id,created,customer_id,customer_email,total_paid,product_id,sku,'
+                                        b'product,category,quantity,price\r\n')
+
+
+# --------------------
+# Administración
+# --------------------
+
+class AdminTests(StoreDataMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'clave')
+        self.client.force_login(self.admin)
+
+    def create_order(self, customer):
+        order = Order.objects.create(customer=customer, customer_email=customer.email, shipping_address='Calle 1',
+                                     total_paid=Decimal('10.00'))
+        order.items.create(product=self.product, quantity=1, price=Decimal('10.00'))
+        return order
+
+    def test_estimated_count_is_exact_for_small_or_filtered_lists_and_capped(self):
+        for i in range(6):
+            self.create_product(f'Taza {i}')
+        paginator = EstimatedCountPaginator(Product.objects.order_by('id'), 2)
+        self.assertEqual(paginator.count, 7)
+
+        class SmallLimit(EstimatedCountPaginator):
+            limit = 3
+
+        # Sin filtros, la tabla "grande" se estima por el último id
+        Product.objects.filter(name='Taza 0').delete()
+        self.assertEqual(SmallLimit(Product.objects.order_by('id'), 2).count, Product.objects.latest('id').id)
+        # Con filtros se cuenta como mucho hasta el límite
+        self.assertEqual(SmallLimit(Product.objects.filter(stock=3).order_by('id'), 2).count, 3)
+
+    def test_changelists_render(self):
+        self.create_order(self.admin)
+        for name in ('admin:store_product_changelist', 'admin:orders_order_changelist', 'admin:auth_user_changelist'):
+            with self.subTest(name=name):
+                self.assertEqual(self.client.get(reverse(name)).status_code, 200)
+
+    def test_delete_history_action_removes_only_the_selected_customers_orders(self):
+        ana = User.objects.create_user('ana', 'ana@example.com')
+        luis = User.objects.create_user('luis', 'luis@example.com')
+        self.create_order(ana)
+        self.create_order(ana)
+        kept = self.create_order(luis)
+
+        response = self.client.post(reverse('admin:auth_user_changelist'), {
+            'action': 'delete_purchase_history', '_selected_action': [ana.id],
+        }, follow=True)
+        self.assertContains(response, 'Se eliminaron 2 órdenes')
+        self.assertEqual(list(Order.objects.all()), [kept])
+        self.assertEqual(list(OrderItem.objects.values_list('order_id', flat=True)), [kept.id])
+
+    def test_staff_view_deletes_the_history_of_one_user(self):
+        ana = User.objects.create_user('ana', 'ana@example.com')
+        self.create_order(ana)
+        kept = self.create_order(self.admin)
+        self.client.post(reverse('delete_history'), {'user_id': ana.id})
+        self.assertEqual(list(Order.objects.all()), [kept])
+
+
+# --------------------
+# Réplicas de lectura
+# --------------------
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(SimpleTestCase):
+    router = PrimaryReplicaRouter()
+
+    def test_catalog_reads_go_to_the_replica_until_something_is_written(self):
+        self.assertEqual(self.router.db_for_read(Product), 'default')
+        with replica_reads():
+            self.assertEqual(self.router.db_for_read(Product), 'replica')
+            self.assertEqual(self.router.db_for_read(Session), 'default')
+            self.assertEqual(self.router.db_for_write(Product), 'default')
+            self.assertTrue(was_pinned())
+            self.assertEqual(self.router.db_for_read(Product), 'default')
+
+    def respond(self, request, write=False):
+        seen = []
+
+        def get_response(request):
+            seen.append(self.router.db_for_read(Product))
+            if write:
+                self.router.db_for_write(Product)
+            return HttpResponse()
+
+        return ReplicaRoutingMiddleware(get_response)(request), seen
+
+    def test_middleware_pins_clients_that_write(self):
+        factory = RequestFactory()
+        response, seen = self.respond(factory.get('/'))
+        self.assertEqual(seen, ['replica'])
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+        response, _ = self.respond(factory.get('/'), write=True)
+        self.assertIn(PIN_COOKIE, response.cookies)
+        response, seen = self.respond(factory.post('/'))
+        self.assertEqual(seen, ['default'])
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+        pinned = factory.get('/')
+        pinned.COOKIES[PIN_COOKIE] = '1'
+        self.assertEqual(self.respond(pinned)[1], ['default'])
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_middleware_is_disabled_without_replicas(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            ReplicaRoutingMiddleware(HttpResponse)
+
+
+# --------------------
+# Datos sintéticos
+# --------------------
+
+class SeedStoreTests(StoreDataMixin, TestCase):
+    def seed(self, products):
+        call_command('seed_store', products=products, categories=3, users=4, orders=products // 2, days=2,
+                     chunk_size=50, stdout=StringIO())
+
+    def clear(self):
+        with CaptureQueriesContext(connection) as queries:
+            clear_seeded_data()
+        return len(queries)
+
+    def test_clear_does_not_cost_queries_per_product(self):
+        self.seed(10)
+        few = self.clear()
+        self.seed(40)
+        self.assertEqual(self.clear(), few)
+
+    def test_clear_removes_the_seeded_rows_from_the_search_index(self):
+        self.seed(20)
+        clear_seeded_data()
+        self.assertEqual(list(Product.objects.values_list('sku', flat=True)), ['CAMISA'])
+        self.assertEqual(search.search_products('pruebas rendimiento'), ([], False))
+        self.assertEqual([p.sku for p in search.search_products('camisa')[0]], ['CAMISA'])
+
+
+# --------------------
+# Instrumentación por petición
+# --------------------
+
+@override_settings(REQUEST_METRICS_ENABLED=True, REQUEST_METRICS_SLOW_MS=10000, REQUEST_METRICS_MAX_QUERIES=2,
+                   REQUEST_METRICS_DUPLICATE_THRESHOLD=3)
+class RequestMetricsTests(StoreDataMixin, TestCase):
+    def respond(self, get_response):
+        return RequestMetricsMiddleware(get_response)(RequestFactory().get('/'))
+
+    def test_server_timing_reports_queries_and_stripe_time(self):
+        def view(request):
+            list(Product.objects.all())
+            with timed('stripe'):
+                pass
+            return HttpResponse()
+
+        timing = self.respond(view)['Server-Timing']
+        self.assertRegex(timing, r'^db;dur=[\d.]+;desc="1 consultas", stripe;dur=[\d.]+, total;dur=[\d.]+$')
+
+    def test_repeated_queries_are_logged_with_their_fingerprint(self):
+        ids = [self.create_product(f'Taza {i}').id for i in range(3)]
+
+        def view(request):
+            for pk in ids:
+                Product.objects.get(pk=pk)
+            return HttpResponse()
+
+        with self.assertLogs('store.requests', 'WARNING') as logs:
+            self.respond(view)
+        self.assertIn('3 consultas', logs.output[0])
+        self.assertIn('3x SELECT ... FROM "store_product" WHERE', logs.output[0])
+
+    def test_fingerprint_ignores_literals_and_in_lists(self):
+        self.assertEqual(
+            fingerprint("SELECT a, b FROM t WHERE id IN (1, 2, 3) AND name = 'x'"),
+            fingerprint("SELECT a FROM t WHERE id IN (7) AND name = 'y''z'"),
+        )
+
+    @override_settings(REQUEST_METRICS_ENABLED=False)
+    def test_disabled_middleware_is_not_used(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            RequestMetricsMiddleware(HttpResponse)
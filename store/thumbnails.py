@@ -0,0 +1,83 @@
+import hashlib
+from io import BytesIO
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+
+# --------------------
+# Miniaturas de imágenes de producto
+# --------------------
+
+# Anchos generados para cada imagen (en píxeles)
+THUMBNAIL_WIDTHS = (200, 400, 800)
+THUMBNAIL_DIR = 'thumbs'
+THUMBNAIL_QUALITY = 80
+CACHE_TIMEOUT = 60 * 60 * 24 * 30
+
+
+def _cache_key(image):
+    # El almacenamiento nunca sobrescribe un archivo subido (le añade un sufijo),
+    # así que una imagen nueva siempre llega con otro nombre
+    return f'store:thumbs:{hashlib.md5(image.name.encode()).hexdigest()}'
+
+
+def get_thumbnails(image):
+    """
+    Devuelve {ancho: url} con las miniaturas WebP de una imagen, generándolas
+    la primera vez.
+
+    Los nombres llevan un hash del contenido original, así que una imagen nueva
+    nunca reutiliza miniaturas viejas y las URLs se pueden cachear para siempre
+    en el navegador. El mapa se guarda en la caché para no leer el archivo
+    original en cada petición. Devuelve {} si la imagen no se puede procesar.
+    """
+    if not image:
+        return {}
+
+    key = _cache_key(image)
+    thumbnails = cache.get(key)
+    if thumbnails is None:
+        thumbnails = generate_thumbnails(image)
+        # Un fallo (archivo ausente o corrupto) se recuerda poco tiempo
+        cache.set(key, thumbnails, CACHE_TIMEOUT if thumbnails else 300)
+    return thumbnails
+
+
+def generate_thumbnails(image):
+    """
+    Genera (si no existen ya en disco) las miniaturas de cada ancho de
+    THUMBNAIL_WIDTHS. Nunca se amplía una imagen más pequeña que el ancho pedido.
+    """
+    try:
+        with image.storage.open(image.name, 'rb') as original:
+            data = original.read()
+        source = Image.open(BytesIO(data))
+        source = ImageOps.exif_transpose(source)
+    except (OSError, ValueError):
+        return {}
+
+    digest = hashlib.sha256(data).hexdigest()[:16]
+    thumbnails = {}
+    for width in THUMBNAIL_WIDTHS:
+        if width > source.width and thumbnails:
+            break
+        path = f'{THUMBNAIL_DIR}/{digest[:2]}/{digest}-{width}.webp'
+        if not default_storage.exists(path):
+            default_storage.save(path, ContentFile(_resize(source, width)))
+        thumbnails[width] = default_storage.url(path)
+    return thumbnails
+
+
+def _resize(source, width):
+    resized = source.copy()
+    if resized.mode not in ('RGB', 'RGBA'):
+        resized = resized.convert('RGBA' if 'transparency' in resized.info else 'RGB')
+    if resized.width > width:
+        height = round(resized.height * width / resized.width)
+        resized = resized.resize((width, height), Image.LANCZOS)
+    buffer = BytesIO()
+    resized.save(buffer, 'WEBP', quality=THUMBNAIL_QUALITY, method=4)
+    return buffer.getvalue()
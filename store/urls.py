@@ -9,6 +9,7 @@ urlpatterns = [
     # 2. RUTAS FIJAS DE ALTO NIVEL (DEBEN IR ANTES DE <slug:>)
     # -----------------------------------------------------
     path('contact/', views.contact_view, name='contact'),
+    path('search/', views.product_search, name='product_search'),
     path('cart/', views.cart_detail, name='cart_detail'),
     path('checkout/', views.checkout, name='checkout'),
     path('history/', views.purchase_history_view, name='purchase_history'),  # YA NO ESTÁ BLOQUEADA
@@ -22,6 +23,10 @@ urlpatterns = [
     path('history/delete/', views.delete_purchase_history, name='delete_history'),
     path('order/<int:order_id>/', views.order_detail, name='order_detail'),
 
+    # EXPORTACIONES PARA EL STAFF (CSV / JSONL en streaming)
+    path('export/<slug:name>/', views.export_data, name='export_data'),
+    path('reports/sales/', views.sales_dashboard, name='sales_dashboard'),
+
     # RUTAS DE INTEGRACIÓN CON STRIPE
     path('payment/success/', views.payment_success, name='payment_success'),
     path('payment/cancel/', views.payment_cancel, name='payment_cancel'),
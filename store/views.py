@@ -1,26 +1,39 @@
 import stripe
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import HttpResponse, JsonResponse
+from django.http import Http404, HttpResponse, HttpResponseBadRequest, StreamingHttpResponse
+from django.template.loader import render_to_string
+from django.utils.html import format_html
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth import views as auth_views
 from django.views.generic import CreateView
-from django.urls import reverse_lazy, reverse
+from django.urls import reverse_lazy
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 from django.conf import settings
-import decimal
+from django.db import transaction
+import json
 from decimal import Decimal
-
-# Importa la función send_mail
-from django.core.mail import send_mail
-import traceback  # Para depuración
-
-# IMPORTANTE: Asegúrate de que Category y Product estén importados
-from .models import Product, ContactMessage, Category
-from orders.models import Order, OrderItem
-from django.contrib.auth import get_user_model
+from urllib.parse import urlencode
+
+from .models import Product, ContactMessage
+from .pagination import keyset_paginate
+from .search import MAX_PAGES, search_products
+from .cache import (
+    cache_anonymous_page, category_scope, get_card_fragments, get_category_or_404, home_scope,
+    product_scope,
+)
+from .cart import get_cart
+from .exports import EXPORTS, FORMATS, ExportFilterError, export_filename, parse_date, stream_export
+from .instrumentation import timed
+from .inventory import (
+    RESERVATION_SESSION_KEY, checkout_session_expiry, new_reservation_token, release_reservation, reserve_cart,
+)
+from orders.models import Order
+from orders.reports import sales_report
+from orders.services import delete_order_history, record_event
 
 # Inicializa Stripe con tu clave secreta
 stripe.api_key = settings.STRIPE_SECRET_KEY
@@ -34,40 +47,90 @@ def get_cart_count(request):
     """
     Función de ayuda para obtener el número total de productos en el carrito.
     """
-    cart = request.session.get('cart', {})
-    return sum(item['quantity'] for item in cart.values())
+    return len(get_cart(request))
 
 
+@cache_anonymous_page(lambda request, category_slug=None: category_scope(category_slug) if category_slug else home_scope())
 def product_list(request, category_slug=None):
     """
     Muestra el catálogo de productos, opcionalmente filtrado por categoría (category_slug).
-    """
-    # 1. Obtener todas las categorías para el menú de navegación (base.html)
-    categories = Category.objects.all()
 
-    # 2. Preparar los productos
-    products = Product.objects.filter(available=True)
+    El catálogo se pagina por cursor (?after=...) sobre el orden (name, id).
+    Las peticiones HTMX de "cargar más" reciben solo el fragmento con las
+    siguientes tarjetas.
+    """
+    # 1. Preparar los productos (el menú de categorías lo aporta el context processor)
+    products = Product.objects.filter(available=True).select_related('category')
     current_category = None
 
-    # 3. Filtrar por categoría si se proporciona un slug
+    # 2. Filtrar por categoría si se proporciona un slug
     if category_slug:
-        # Aseguramos que la categoría exista, si no, devuelve un 404
-        current_category = get_object_or_404(Category, slug=category_slug)
+        # Aseguramos que la categoría exista (desde la caché), si no, devuelve un 404
+        current_category = get_category_or_404(category_slug)
         products = products.filter(category=current_category)
 
-    cart_count = get_cart_count(request)
+    # 3. Paginar por cursor: el coste de cada página no depende de su profundidad
+    page = keyset_paginate(
+        products,
+        after=request.GET.get('after'),
+        per_page=settings.PRODUCTS_PER_PAGE,
+    )
 
     context = {
-        'categories': categories,  # Lista de todas las categorías
-        'products': products,  # Lista de productos (filtrados o todos)
+        'products': page.items,  # Página actual de productos
+        'card_fragments': get_card_fragments(page.items),  # Tarjetas ya renderizadas (un solo get_many)
+        'next_page_url': f'{request.path}?after={page.next_cursor}' if page.has_next else None,
         'current_category': current_category,  # Categoría seleccionada (para el título y el menú activo)
-        'cart_count': cart_count,
-        'stripe_public_key': settings.STRIPE_PUBLIC_KEY
     }
 
+    if request.headers.get('HX-Request') and request.GET.get('after'):
+        return render(request, 'store/partials/product_cards.html', context)
+
+    context.update({
+        'cart_count': get_cart_count(request),
+        'stripe_public_key': settings.STRIPE_PUBLIC_KEY
+    })
+
     return render(request, 'store/product_list.html', context)
 
 
+def product_search(request):
+    """
+    Busca productos por nombre, descripción o SKU usando el índice FTS5,
+    con resultados ordenados por relevancia y paginados (?page=N, hasta
+    MAX_PAGES; más allá se devuelve un 404).
+    """
+    query = request.GET.get('q', '').strip()
+    try:
+        page_number = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        page_number = 1
+    if page_number > MAX_PAGES:
+        raise Http404('Página de resultados fuera de rango.')
+
+    products, has_next = search_products(query, page=page_number, per_page=settings.PRODUCTS_PER_PAGE)
+
+    next_page_url = None
+    if has_next:
+        next_page_url = f"{request.path}?{urlencode({'q': query, 'page': page_number + 1})}"
+
+    context = {
+        'query': query,
+        'products': products,
+        'card_fragments': get_card_fragments(products),
+        'next_page_url': next_page_url,
+    }
+
+    if request.headers.get('HX-Request') and page_number > 1:
+        return render(request, 'store/partials/product_cards.html', context)
+
+    context.update({
+        'cart_count': get_cart_count(request),
+    })
+    return render(request, 'store/search_results.html', context)
+
+
+@cache_anonymous_page(lambda request, slug: product_scope(slug))
 def product_detail(request, slug):
     """
     Muestra los detalles de un solo producto, buscándolo por SLUG.
@@ -75,12 +138,10 @@ def product_detail(request, slug):
     # Buscar por slug en lugar de ID
     product = get_object_or_404(Product, slug=slug, available=True)
     cart_count = get_cart_count(request)
-    categories = Category.objects.all()
 
     context = {
         'product': product,
         'cart_count': cart_count,
-        'categories': categories,
     }
     return render(request, 'store/product_detail.html', context)
 
@@ -89,110 +150,111 @@ def get_cart_count_view(request):
     """
     Devuelve solo el número total de productos en el carrito (para HTMX).
     """
-    cart = request.session.get('cart', {})
-    item_count = sum(item['quantity'] for item in cart.values())
-    return HttpResponse(str(item_count))
+    return HttpResponse(str(get_cart_count(request)))
 
 
 # --------------------
 # Vistas del Carrito
 # --------------------
 
+def cart_count_oob(count):
+    """
+    Fragmento fuera de banda (hx-swap-oob) que actualiza el contador del
+    carrito de base.html en la misma respuesta, sin una segunda petición.
+    """
+    return format_html('<span id="cart-count" hx-swap-oob="true">{}</span>', count)
+
+
 def add_to_cart(request, product_id):
     """
     Añade un producto al carrito de la sesión.
     """
     product = get_object_or_404(Product, id=product_id)
-    cart = request.session.get('cart', {})
-    product_id_str = str(product.id)
+    cart = get_cart(request)
 
     if product.stock <= 0:
         message_html = f'<div class="floating-message error">¡Lo sentimos! Este producto está agotado.</div>'
-        response = HttpResponse(message_html)
-        response['HX-Trigger'] = 'updateCart'
-        return response
-
-    if product_id_str not in cart:
-        cart[product_id_str] = {'quantity': 1, 'price': str(product.price), 'name': product.name}
-    else:
-        current_quantity = cart[product_id_str]['quantity']
-        if current_quantity >= product.stock:
-            message_html = f'<div class="floating-message error">¡No hay más stock para {product.name}!</div>'
-            response = HttpResponse(message_html)
-            response['HX-Trigger'] = 'updateCart'
-            return response
+        return HttpResponse(message_html)
 
-        cart[product_id_str]['quantity'] += 1
+    if cart.quantity(product.id) >= product.stock:
+        message_html = f'<div class="floating-message error">¡No hay más stock para {product.name}!</div>'
+        return HttpResponse(message_html)
 
-    request.session['cart'] = cart
-    item_count = sum(item['quantity'] for item in cart.values())
+    cart.add(product)
+    item_count = len(cart)
 
-    # Usamos hx-swap="none" en el botón, por lo que este HTML solo se usa para el mensaje flotante
+    # El mensaje flotante va al #floating-message-container y el contador se
+    # actualiza en la misma respuesta mediante hx-swap-oob
     message_html = f'<div class="floating-message">¡Añadiste {product.name}! Llevas {item_count} productos.</div>'
-    response = HttpResponse(message_html)
-    response['HX-Trigger'] = 'updateCart'
-
-    return response
+    return HttpResponse(message_html + cart_count_oob(item_count))
 
 
 def cart_detail(request):
     """
     Muestra los productos del carrito y el total.
     """
-    cart = request.session.get('cart', {})
-    cart_items = []
-    cart_total = 0
+    cart = get_cart(request)
     if not request.user.is_authenticated:
         messages.info(request, "¡Regístrate o inicia sesión para guardar tu carrito y finalizar tu compra!")
-    for key, item in cart.items():
-        try:
-            # Intentamos obtener el producto para tener la imagen o más detalles
-            product = Product.objects.get(id=key)
-            item['image_url'] = product.image.url if product.image else None
-        except Product.DoesNotExist:
-            item['image_url'] = None
-
-        item['product_id'] = key
-        item_total = float(item['price']) * item['quantity']
-        cart_total += item_total
-        item['total'] = item_total
-        cart_items.append(item)
-
-    cart_count = get_cart_count(request)
-    categories = Category.objects.all()
 
     context = {
-        'cart_items': cart_items,
-        'cart_total': cart_total,
-        'cart_count': cart_count,
-        'categories': categories,
+        'cart_items': cart.lines,  # Productos cargados en una sola consulta
+        'cart_total': cart.subtotal,
+        'cart_count': len(cart),
     }
     return render(request, 'store/cart_detail.html', context)
 
 
+def render_cart_fragment(request, cart, line=None, message=None):
+    """
+    Respuesta parcial para las acciones HTMX del carrito: la fila modificada
+    (vacía si se eliminó), más el bloque de totales, el contador y un mensaje
+    flotante opcional como fragmentos hx-swap-oob.
+    """
+    if not cart:
+        # El carrito quedó vacío: recargamos para mostrar el mensaje de carrito vacío
+        response = HttpResponse()
+        response['HX-Refresh'] = 'true'
+        return response
+
+    html = render_to_string('store/partials/cart_row.html', {'item': line}, request) if line else ''
+    html += render_to_string('store/partials/cart_totals.html', {'cart_total': cart.subtotal, 'oob': True})
+    html += cart_count_oob(len(cart))
+    if message:
+        html += format_html(
+            '<div id="floating-message-container" hx-swap-oob="innerHTML"><div class="floating-message error">{}</div></div>',
+            message,
+        )
+    return HttpResponse(html)
+
+
 def update_cart(request, product_id):
     """
     Actualiza la cantidad de un producto en el carrito.
+
+    Con HTMX devuelve solo la fila y los totales actualizados; los productos
+    del carrito se cargan en una única consulta.
     """
-    cart = request.session.get('cart', {})
-    product_id_str = str(product_id)
-    product = get_object_or_404(Product, id=product_id)
+    cart = get_cart(request)
+    line = cart.get_line(product_id)
+    error = None
 
-    if product_id_str in cart:
+    if line:
         action = request.POST.get('action')
-        current_quantity = cart[product_id_str]['quantity']
 
         if action == 'increase':
-            if current_quantity < product.stock:
-                cart[product_id_str]['quantity'] += 1
+            if line.quantity < line.stock:
+                cart.set_quantity(product_id, line.quantity + 1)
             else:
-                messages.error(request, f"Límite de stock ({product.stock}) alcanzado para {product.name}.")
-        elif action == 'decrease' and current_quantity > 1:
-            cart[product_id_str]['quantity'] -= 1
+                error = f"Límite de stock ({line.stock}) alcanzado para {line.name}."
+        elif action == 'decrease' and line.quantity > 1:
+            cart.set_quantity(product_id, line.quantity - 1)
 
-        request.session['cart'] = cart
-        request.session.modified = True
+    if request.headers.get('HX-Request'):
+        return render_cart_fragment(request, cart, line, error)
 
+    if error:
+        messages.error(request, error)
     return redirect('cart_detail')
 
 
@@ -200,13 +262,13 @@ def remove_from_cart(request, product_id):
     """
     Elimina un producto del carrito.
     """
-    cart = request.session.get('cart', {})
-    product_id_str = str(product_id)
+    cart = get_cart(request)
+    removed = cart.remove(product_id)
+
+    if request.headers.get('HX-Request'):
+        return render_cart_fragment(request, cart)
 
-    if product_id_str in cart:
-        del cart[product_id_str]
-        request.session['cart'] = cart
-        request.session.modified = True
+    if removed:
         messages.success(request, "Producto eliminado del carrito.")
 
     return redirect('cart_detail')
@@ -221,14 +283,14 @@ def checkout(request):
     """
     Crea una sesión de Checkout de Stripe y redirige al usuario a la pasarela de pago.
     """
-    cart = request.session.get('cart', {})
+    cart = get_cart(request)
 
     if not cart:
         messages.error(request, "Tu carrito está vacío.")
         return redirect('product_list')
 
-    # Convertir a Decimal para cálculos precisos
-    subtotal = sum(Decimal(item['price']) * item['quantity'] for item in cart.values())
+    # Totales en Decimal calculados una sola vez por el servicio del carrito
+    subtotal = cart.subtotal
     shipping_fee = Decimal(str(settings.SHIPPING_FEE))
     total_con_envio = subtotal + shipping_fee
 
@@ -239,34 +301,44 @@ def checkout(request):
             messages.error(request, "Por favor, ingresa una dirección de envío.")
             return redirect('checkout')
 
-        # 1. Preparar items para Stripe
+        # 1. Validar y reservar el stock de todo el carrito. Las unidades quedan
+        # apartadas hasta que el pago se confirme o la reserva expire.
+        reservation = new_reservation_token()
+        with transaction.atomic():
+            shortages = reserve_cart(cart, reservation, request.session.get(RESERVATION_SESSION_KEY))
+
+        if shortages:
+            for shortage in shortages:
+                messages.error(
+                    request,
+                    f"Stock insuficiente para {shortage['name']}: "
+                    f"pediste {shortage['requested']}, disponibles {shortage['available']}."
+                )
+            return redirect('cart_detail')
+
+        # 2. Preparar items para Stripe
         line_items = []
-        for product_id_str, item_data in cart.items():
-            product = get_object_or_404(Product, id=int(product_id_str))
-
-            # Validación de stock
-            if product.stock < item_data['quantity']:
-                messages.error(request, f"Stock insuficiente para {product.name}.")
-                return redirect('cart_detail')
+        for line in cart.lines:
+            product = line.product
 
             line_items.append({
                 'price_data': {
                     'currency': settings.DEFAULT_CURRENCY,
                     # Stripe usa centavos, por eso multiplicamos por 100 y convertimos a int
-                    'unit_amount': int(Decimal(item_data['price']) * 100),
+                    'unit_amount': int(line.price * 100),
                     'product_data': {
-                        'name': item_data['name'],
+                        'name': line.name,
                         'description': product.description[:50] if product.description else 'Producto de la tienda',
                         # CRÍTICO: PASAR EL ID DEL PRODUCTO DE DJANGO EN LA METADATA
                         'metadata': {
-                            'product_id': product_id_str,
+                            'product_id': line.product_id,
                         }
                     },
                 },
-                'quantity': item_data['quantity'],
+                'quantity': line.quantity,
             })
 
-        # 2. Agregar el costo de envío como un line_item (si es mayor a cero)
+        # 3. Agregar el costo de envío como un line_item (si es mayor a cero)
         if shipping_fee > 0:
             line_items.append({
                 'price_data': {
@@ -280,197 +352,85 @@ def checkout(request):
                 'quantity': 1,
             })
 
+        request.session[RESERVATION_SESSION_KEY] = reservation
+
         try:
-            # 3. Crear la Sesión de Checkout en Stripe
-            checkout_session = stripe.checkout.Session.create(
-                payment_method_types=['card'],
-                line_items=line_items,
-                mode='payment',
-                # URLs de redirección
-                success_url=request.build_absolute_uri(
-                    reverse_lazy('payment_success')) + '?session_id={CHECKOUT_SESSION_ID}',
-                cancel_url=request.build_absolute_uri(reverse_lazy('checkout')),
-
-                # Metadata para identificar la orden después del pago (¡IMPORTANTE!)
-                metadata={
-                    'customer_id': request.user.id,
-                    'shipping_address': address,
-                    # Ya no necesitamos guardar todo el carrito aquí, usamos la metadata del line_item
-                },
-                customer_email=request.user.email,
-            )
+            # 4. Crear la Sesión de Checkout en Stripe (expira justo antes que la reserva)
+            with timed('stripe'):
+                checkout_session = stripe.checkout.Session.create(
+                    payment_method_types=['card'],
+                    line_items=line_items,
+                    mode='payment',
+                    # URLs de redirección
+                    success_url=request.build_absolute_uri(
+                        reverse_lazy('payment_success')) + '?session_id={CHECKOUT_SESSION_ID}',
+                    cancel_url=request.build_absolute_uri(reverse_lazy('checkout')),
+
+                    # Metadata para identificar la orden después del pago (¡IMPORTANTE!)
+                    metadata={
+                        'customer_id': request.user.id,
+                        'shipping_address': address,
+                        'reservation': reservation,  # Reserva de stock que se convierte en venta al pagar
+                        # Ya no necesitamos guardar todo el carrito aquí, usamos la metadata del line_item
+                    },
+                    customer_email=request.user.email,
+                    expires_at=int(checkout_session_expiry().timestamp()),
+                )
 
             # Redirigir al usuario a la URL de pago de Stripe
             return redirect(checkout_session.url, code=303)
 
         except Exception as e:
+            # Sin sesión de pago no hay nada que reservar
+            release_reservation(reservation)
+            del request.session[RESERVATION_SESSION_KEY]
             messages.error(request, f"Ocurrió un error al iniciar el pago: {str(e)}")
             return redirect('checkout')
 
     # Lógica para GET
-    cart_count = get_cart_count(request)
-    categories = Category.objects.all()
+    cart_count = len(cart)
 
     context = {
-        'cart_items': cart.values(),
+        'cart_items': cart.lines,
         'subtotal': subtotal,
         'shipping_fee': shipping_fee,
         'cart_total': total_con_envio,
         'cart_count': cart_count,
         'stripe_public_key': settings.STRIPE_PUBLIC_KEY,
-        'categories': categories,
     }
     return render(request, 'store/checkout.html', context)
 
 
-# --- FUNCIÓN DE ENVÍO DE CORREO ---
-def send_order_confirmation_email(order):
-    """
-    Función de ayuda para enviar un correo de confirmación al cliente.
-    """
-    subject = f'Confirmación de tu compra #{order.id}'
-    # Usar el nombre de usuario del cliente si está disponible, si no, usar el correo
-    customer_identifier = order.customer.username if order.customer else order.customer_email
-
-    message = (
-        f'Hola {customer_identifier},\n\n'
-        f'¡Gracias por tu compra! Tu orden #{order.id} ha sido confirmada y tu pago ha sido procesado exitosamente.\n'
-        f'Tu pedido será enviado a la siguiente dirección:\n'
-        f'{order.shipping_address}\n\n'
-        f'Total Pagado: ${order.total_paid:.2f}\n\n'
-        f'Puedes ver los detalles completos de tu orden en tu historial de compras.\n\n'
-        f'¡Gracias por preferirnos!\n'
-        f'El equipo de tu tienda'
-    )
-    from_email = settings.EMAIL_HOST_USER
-    recipient_list = [order.customer_email]
-
-    try:
-        # Asegúrate de que settings.EMAIL_HOST_USER esté configurado
-        send_mail(subject, message, from_email, recipient_list, fail_silently=False)
-    except Exception as e:
-        print(f"Error al enviar el correo de confirmación: {e}")
-
-
 # Vistas de Redirección de Stripe (NUEVAS)
 # -----------------------------------------------------
 
 @login_required
 def payment_success(request):
     """
-    Esta vista crea la orden localmente si el pago de Stripe es exitoso
-    y envía un correo de confirmación.
+    Página a la que Stripe redirige tras el pago.
 
-    CORRECCIÓN CRÍTICA: Se modificó la lógica para usar el product_id
-    guardado en la metadata del line item de Stripe, en lugar de confiar
-    en el nombre del producto, lo que es mucho más robusto.
+    La orden la crea el worker (process_stripe_events) a partir del evento
+    'checkout.session.completed' recibido en el webhook; esta vista solo
+    vacía el carrito y muestra la orden si ya está registrada, sin llamar a
+    Stripe ni esperar al envío del correo.
     """
     session_id = request.GET.get('session_id')
     if not session_id:
         messages.error(request, "No se encontró ID de sesión de Stripe.")
         return redirect('purchase_history')
 
-    # Evita que una orden se cree dos veces si el usuario refresca la página
-    # Se debe verificar si el objeto Order ya fue creado
-    if Order.objects.filter(stripe_checkout_session_id=session_id).exists():
-        order = Order.objects.get(stripe_checkout_session_id=session_id)
-        messages.info(request, f"Esta orden (#{order.id}) ya ha sido registrada.")
-        # Simplemente redirigimos al detalle de la orden existente
-        return redirect('order_detail', order_id=order.id)
+    # El pago ya se realizó: el carrito de la sesión ya no es necesario. La
+    # reserva no se libera aquí: el worker la convierte en venta al crear la orden.
+    get_cart(request).clear()
+    request.session.pop(RESERVATION_SESSION_KEY, None)
 
+    order = Order.objects.filter(stripe_checkout_session_id=session_id, customer=request.user).first()
+    if order is None:
+        messages.info(request, "¡Pago recibido! Estamos confirmando tu orden; aparecerá en tu historial en unos instantes.")
+        return redirect('purchase_history')
 
-    try:
-        # 1. Recuperar la sesión de Stripe
-        session = stripe.checkout.Session.retrieve(session_id)
-
-        if session.payment_status == 'paid':
-            user_id = session.metadata.get('customer_id')
-            shipping_address = session.metadata.get('shipping_address')
-            # Stripe amount_total está en centavos. Dividimos por 100 para obtener el valor correcto en Decimal
-            total_paid = Decimal(session.amount_total / 100)
-
-            User = get_user_model()
-            customer = User.objects.get(id=user_id)
-
-            # 2. Crear la Orden principal
-            order = Order.objects.create(
-                customer=customer,
-                customer_email=session.customer_details['email'],
-                shipping_address=shipping_address,
-                total_paid=total_paid,
-                stripe_checkout_session_id=session_id
-            )
-
-            # 3. Obtener los productos de la sesión de Stripe y crear los OrderItems
-            # NOTA: Debemos expandir los line_items para obtener la metadata del producto
-            # Se usa `expand=['data.price.product']` para que Stripe incluya los detalles del producto
-            line_items = stripe.checkout.Session.list_line_items(
-                session_id,
-                expand=['data.price.product'], # Expandir para acceder a la metadata del producto
-                limit=100
-            )
-
-            for item in line_items.data:
-                # Omitir el item de envío buscando la metadata del producto, que solo lo tienen los productos reales
-                product_metadata = item.price.product.metadata if item.price.product and item.price.product.metadata else {}
-                product_id_str = product_metadata.get('product_id')
-
-                if not product_id_str:
-                    # Si no hay product_id, asumimos que es el costo de envío o un item no mapeado
-                    continue
-
-                try:
-                    # CRÍTICO: OBTENER EL ID DE DJANGO DE LA METADATA DE STRIPE
-                    product = Product.objects.get(id=int(product_id_str))
-
-                    item_quantity = item.quantity
-                    item_price_total = Decimal(item.amount_total / 100)
-                    item_price = item_price_total / item_quantity  # Precio unitario
-
-                    # 4. Descontar stock
-                    product.stock -= item_quantity
-                    product.save()
-
-                    # 5. Crear el Item de la Orden
-                    OrderItem.objects.create(
-                        order=order,
-                        product=product,
-                        price=item_price,
-                        quantity=item_quantity
-                    )
-                except Product.DoesNotExist:
-                    # Esto debe ser muy raro si la metadata fue bien configurada
-                    print(f"Advertencia: Producto con ID '{product_id_str}' no encontrado. OrdenItem no creado.")
-                    continue
-                except Exception as e:
-                    print(f"Error al procesar OrderItem: {e}")
-                    continue
-
-            # 6. Vaciar el carrito de la sesión
-            # Esto debe hacerse AHORA, después de que todos los items se hayan guardado correctamente
-            if 'cart' in request.session:
-                del request.session['cart']
-                request.session.modified = True
-
-            # 7. Envío de Correo
-            send_order_confirmation_email(order)
-
-            messages.success(request,
-                             f"¡Pago exitoso! Tu orden #{order.id} ha sido registrada y se ha enviado un correo de confirmación.")
-            return redirect('order_detail', order_id=order.id) # Redirigir al detalle de la orden
-        else:
-            # El pago no está en estado 'paid'
-            messages.error(request, "El pago no se completó. Por favor, inténtalo de nuevo.")
-            return redirect('checkout')
-
-    except stripe.error.StripeError as e:
-        messages.error(request, f"Error de Stripe durante la verificación: {str(e)}")
-        traceback.print_exc()
-        return redirect('checkout')
-    except Exception as e:
-        messages.error(request, f"Ocurrió un error inesperado durante la verificación del pago: {str(e)}")
-        tracebox.print_exc()
-        return redirect('checkout')
+    messages.success(request, f"¡Pago exitoso! Tu orden #{order.id} ha sido registrada.")
+    return redirect('order_detail', order_id=order.id)  # Redirigir al detalle de la orden
 
 
 @login_required
@@ -483,14 +443,26 @@ def payment_cancel(request):
 
 
 @csrf_exempt
+@require_POST
 def stripe_webhook(request):
     """
-    Esta vista maneja los eventos de Stripe de forma asíncrona.
-    En un entorno de producción, se usaría para crear la orden
-    en lugar de 'payment_success' para mayor robustez.
+    Recibe los eventos de Stripe: verifica la firma con STRIPE_WEBHOOK_SECRET,
+    guarda el evento en la bandeja de entrada y responde de inmediato. Las
+    órdenes se crean después con el comando process_stripe_events.
     """
-    # Esta vista debe verificar la firma del webhook y procesar eventos.
-    # Por ahora, solo es un esqueleto. En el flujo actual, la orden se crea en payment_success.
+    payload = request.body
+    try:
+        stripe.WebhookSignature.verify_header(
+            payload.decode('utf-8'),
+            request.headers.get('Stripe-Signature'),
+            settings.STRIPE_WEBHOOK_SECRET,
+            stripe.Webhook.DEFAULT_TOLERANCE,
+        )
+        event = json.loads(payload)
+    except (ValueError, stripe.error.SignatureVerificationError):
+        return HttpResponse(status=400)
+
+    record_event(event)
     return HttpResponse(status=200)
 
 
@@ -502,12 +474,10 @@ def order_detail(request, order_id):
     order = get_object_or_404(Order, id=order_id, customer=request.user)
     # Ya no se necesita el filtro adicional, el template usa order.items.all
     cart_count = get_cart_count(request)
-    categories = Category.objects.all()
 
     context = {
         'order': order,
         'cart_count': cart_count,
-        'categories': categories,
     }
     return render(request, 'store/order_detail.html', context)
 
@@ -519,12 +489,10 @@ def purchase_history_view(request):
     """
     orders = Order.objects.filter(customer=request.user).order_by('-created')
     cart_count = get_cart_count(request)
-    categories = Category.objects.all()
 
     context = {
         'orders': orders,
         'cart_count': cart_count,
-        'categories': categories,
     }
     return render(request, 'store/purchase_history.html', context)
 
@@ -537,10 +505,8 @@ def delete_purchase_history(request):
     if request.method == 'POST':
         user_id = request.POST.get('user_id')
         if user_id:
-            # CORRECCIÓN: Usar 'customer' o 'user' según tu modelo Order.
-            # Según tu modelo, el campo es `customer` (o `user` en el modelo proporcionado).
-            # Me guío por la vista `purchase_history_view` que usa `customer=request.user`.
-            Order.objects.filter(customer_id=user_id).delete()
+            # Borrado por conjuntos, sin cargar las órdenes completas
+            delete_order_history([user_id])
             messages.success(request, "El historial de compras del usuario ha sido eliminado.")
             return redirect('purchase_history')
         else:
@@ -551,6 +517,62 @@ def delete_purchase_history(request):
     return redirect('purchase_history')
 
 
+# --------------------
+# Exportaciones (staff)
+# --------------------
+
+@staff_member_required
+def export_data(request, name):
+    """
+    Descarga en streaming el catálogo ('products') o las líneas de pedido
+    ('orders') en CSV o JSONL.
+
+    Parámetros GET: format=csv|jsonl, since/until=AAAA-MM-DD, category=<slug>
+    y gzip=1 para comprimir al vuelo. Los datos se leen por bloques y se
+    envían a medida que se generan, sin construir el archivo en memoria.
+    """
+    if name not in EXPORTS:
+        raise Http404
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in FORMATS:
+        return HttpResponseBadRequest('Formato no soportado.')
+    compress = request.GET.get('gzip') == '1'
+
+    try:
+        filters = {
+            'since': parse_date(request.GET.get('since'), 'since'),
+            'until': parse_date(request.GET.get('until'), 'until'),
+            'category': request.GET.get('category') or None,
+        }
+    except ExportFilterError as e:
+        return HttpResponseBadRequest(str(e))
+
+    content_type = 'application/gzip' if compress else (
+        'text/csv; charset=utf-8' if fmt == 'csv' else 'application/x-ndjson; charset=utf-8'
+    )
+    response = StreamingHttpResponse(stream_export(name, fmt, compress, **filters), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{export_filename(name, fmt, compress)}"'
+    return response
+
+
+@staff_member_required
+def sales_dashboard(request):
+    """
+    Panel de ventas para el staff. Lee solo de las tablas de resumen
+    (update_sales_rollups), nunca de Order/OrderItem.
+    Parámetros GET: since/until=AAAA-MM-DD (por defecto, los últimos 30 días).
+    """
+    try:
+        since = parse_date(request.GET.get('since'), 'since')
+        until = parse_date(request.GET.get('until'), 'until')
+    except ExportFilterError as e:
+        messages.error(request, str(e))
+        since = until = None
+
+    context = sales_report(since, until)
+    return render(request, 'store/sales_dashboard.html', context)
+
+
 # --------------------
 # Vistas de Autenticación
 # --------------------
@@ -618,10 +640,8 @@ def contact_view(request):
         return redirect('contact')
 
     cart_count = get_cart_count(request)
-    categories = Category.objects.all()
 
     context = {
         'cart_count': cart_count,
-        'categories': categories,
     }
     return render(request, 'store/contact.html', context)